@@ -2,15 +2,22 @@
     'name': 'Company Budget',
     'version': '1.0',
     'summary': 'Pencatatan Budget Perusahaan',
-    'depends': ['base', 'product', 'uom', 'purchase'],
+    'depends': ['base', 'product', 'uom', 'account', 'purchase'],
     'data': [
         'security/ir.model.access.csv',
         'data/sequence.xml',
+        'data/cron.xml',
         'menu.xml',
         'view/budget.xml',
         'view/purchase.xml',
         'view/memo_over_budget.xml',
-        'view/budget_template.xml'
+        'view/budget_template.xml',
+        'view/budget_report.xml',
+        'view/budget_perf_stat.xml',
+        'view/budget_import.xml',
+        'view/budget_revision.xml',
+        'view/budget_consolidation.xml',
+        'view/budget_rollover.xml'
     ],
     'installable': True,
     'application': False,
@@ -0,0 +1,36 @@
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import request, content_disposition
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class BudgetExportController(http.Controller):
+
+    @http.route('/pd_budget/export/<int:budget_id>', type='http', auth='user')
+    def export_budget(self, budget_id, file_format='csv', **kwargs):
+        if file_format not in EXPORT_MIMETYPES:
+            raise request.not_found()
+        budget = request.env['budget.budget'].browse(budget_id).exists()
+        if not budget:
+            raise request.not_found()
+        budget.check_access('read')
+
+        # file sementara di disk lalu dikirim bertahap, tidak ditahan di memory
+        fp = tempfile.TemporaryFile()
+        budget._export_to_file(fp, file_format)
+        fp.seek(0)
+        filename = f"{budget.budget_number.replace('/', '-')}.{file_format}"
+        return request.make_response(
+            wrap_file(request.httprequest.environ, fp),
+            headers=[
+                ('Content-Type', EXPORT_MIMETYPES[file_format]),
+                ('Content-Disposition', content_disposition(filename)),
+            ],
+        )
@@ -1 +1 @@
-from . import budget, purchase, budget_template, memo_over_budget
\ No newline at end of file
+from . import budget_perf_stat, budget, purchase, budget_template, memo_over_budget, budget_consumption, account_move, budget_report, budget_recompute_queue, budget_import, budget_export, budget_revision, budget_consolidation, budget_rollover
\ No newline at end of file
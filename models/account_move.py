@@ -0,0 +1,32 @@
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _compute_payment_state(self):
+        paid_before = {move.id: move.payment_state == 'paid' for move in self}
+        super(AccountMove, self)._compute_payment_state()
+
+        # compute juga jalan saat flush / onchange: key dikumpulkan, refresh ledger di precommit
+        changed = self.filtered(lambda m: m.id and (m.payment_state == 'paid') != paid_before.get(m.id))
+        orders = changed.line_ids.purchase_line_id.order_id
+        if orders:
+            self._schedule_budget_refresh(orders.order_line._budget_keys())
+
+    def _schedule_budget_refresh(self, keys):
+        if not keys:
+            return
+        precommit = self.env.cr.precommit
+        pending = precommit.data.get('budget.paid_keys')
+        if pending is None:
+            pending = precommit.data['budget.paid_keys'] = set()
+            env = self.env
+
+            @precommit.add
+            def refresh_budget_consumption():
+                keys = precommit.data.pop('budget.paid_keys', set())
+                env['budget.recompute.queue']._schedule(keys)
+                env.flush_all()
+
+        pending.update(keys)
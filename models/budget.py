@@ -1,4 +1,59 @@
+from collections import Counter, defaultdict
+
 from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+from .budget_perf_stat import instrument
+
+
+ITEM_TREE_FIELDS = ['code', 'name', 'type', 'budget_plan', 'request', 'remaining', 'over_budget', 'actual']
+
+
+def lock_rows(records):
+    # kunci baris dengan urutan id yang sama di semua transaksi agar tidak deadlock
+    if records.ids:
+        records.env.cr.execute(SQL(
+            "SELECT id FROM %s WHERE id IN %s ORDER BY id FOR UPDATE",
+            SQL.identifier(records._table), tuple(sorted(records.ids)),
+        ))
+
+
+def reserve_code_numbers(records, fname, counts, seed, step):
+    # kunci baris counter berurutan (ORDER BY id) lalu naikkan untuk seluruh batch,
+    # return nomor terakhir sebelum dialokasikan per record
+    cr = records.env.cr
+    records.flush_recordset([fname])
+    cr.execute(SQL(
+        "SELECT id, %s FROM %s WHERE id IN %s ORDER BY id FOR UPDATE",
+        SQL.identifier(fname), SQL.identifier(records._table), tuple(records.ids),
+    ))
+    current = dict(cr.fetchall())
+    missing = records.browse([rec_id for rec_id, value in current.items() if value is None])
+    if missing:
+        current.update(seed(missing))
+
+    for rec_id in sorted(counts):
+        cr.execute(SQL(
+            "UPDATE %s SET %s = %s WHERE id = %s",
+            SQL.identifier(records._table), SQL.identifier(fname),
+            current[rec_id] + counts[rec_id] * step, rec_id,
+        ))
+    records.invalidate_recordset([fname])
+    return current
+
+
+def check_child_capacity(parents, last_nums, counts, number_of, label):
+    # child memakai nomor parent + 1..99, nomor parent + 100 sudah milik parent berikutnya
+    for parent in parents:
+        if last_nums[parent.id] + counts[parent.id] >= number_of(parent) + 100:
+            raise UserError(
+                f"{label} '{parent.display_name}' sudah mencapai batas 99 child. "
+                f"Buat parent baru untuk menambah item."
+            )
+
 
 class Budget(models.Model):
     _name = 'budget.budget'
@@ -10,67 +65,247 @@ class Budget(models.Model):
     budget_type = fields.Char(string="Budget Type", required=True)
     start_periode = fields.Date(string="Start Periode", required=True)
     end_periode = fields.Date(string="End Periode", required=True)
+    company_id = fields.Many2one('res.company', string="Company", required=True, default=lambda self: self.env.company, index=True)
     currency_id = fields.Many2one('res.currency', string="Currency", default=lambda self: self.env.company.currency_id.id)
     notes = fields.Text(string="Notes")
     template_id = fields.Many2one('budget.template', string="Budget Template", ondelete="cascade")
     item_ids = fields.One2many('budget.item', 'budget_id', string="Item List")
-
-    def _generate_items_from_template(self):
+    top_item_ids = fields.One2many('budget.item', 'budget_id', string="Top Level Items", domain=[('parent_id', '=', False)])
+    item_code_counter = fields.Integer(string="Last Item Code", readonly=True, copy=False)
+    template_update_mode = fields.Selection([
+        ('replace', 'Replace Items'),
+        ('merge', 'Keep Existing Items'),
+    ], string="On Template Change", default='replace', required=True)
+    force_sync_recompute = fields.Boolean(
+        string="Strict Enforcement",
+        help="Selalu hitung ulang konsumsi dan plan budget secara langsung. Tanpa opsi ini "
+             "perubahan plan dari PO dicatat di queue dan dilipat oleh cron, begitu juga "
+             "konsumsi jika mode deferred (budget.deferred_recompute) aktif.",
+    )
+    recompute_pending = fields.Boolean(string="Recompute Pending", compute="_compute_recompute_pending")
+    actual_to_date = fields.Float(string="Actual to Date", digits=(16, 2), compute="_compute_consumption_forecast")
+    burn_rate = fields.Float(string="Monthly Burn Rate", digits=(16, 2), compute="_compute_consumption_forecast")
+    forecast_actual = fields.Float(string="Forecast at End Periode", digits=(16, 2), compute="_compute_consumption_forecast")
+
+    def _compute_recompute_pending(self):
+        pending = self.env['budget.recompute.queue'].sudo()._read_group(
+            [('budget_item_id.budget_id', 'in', self._origin.ids)], ['budget_item_id'],
+        )
+        pending_budget_ids = {item.budget_id.id for item, in pending}
         for budget in self:
-            if not budget.template_id:
-                continue
+            budget.recompute_pending = budget._origin.id in pending_budget_ids
 
-            parents = {}
-            # Parent items
-            for detail in budget.template_id.detail_ids.filtered(lambda d: not d.parent_id):
-                parent_item = self.env['budget.item'].create({
-                    'budget_id': budget.id,
-                    'name': detail.name,
-                    'type': detail.type,
-                    'check_detail': detail.check_detail,
-                    'is_parent': detail.is_parent,
-                })
-                parents[detail.id] = parent_item
-
-            # Child items
-            for detail in budget.template_id.detail_ids.filtered(lambda d: d.parent_id):
-                parent_item = parents.get(detail.parent_id.id)
-                if parent_item:
-                    self.env['budget.item'].create({
-                        'budget_id': budget.id,
-                        'parent_id': parent_item.id,
-                        'name': detail.name,
-                        'type': detail.type,
-                        'check_detail': detail.check_detail,
-                        'is_parent': detail.is_parent,
-                    })
+    def _compute_consumption_forecast(self):
+        forecasts = self._origin.get_consumption_forecast()
+        for budget in self:
+            forecast = forecasts.get(budget._origin.id, {})
+            budget.actual_to_date = forecast.get('paid_to_date', 0.0)
+            budget.burn_rate = forecast.get('paid_burn_rate', 0.0)
+            budget.forecast_actual = forecast.get('paid_forecast', 0.0)
 
     @api.model
-    def create(self, vals):
-        if vals.get('budget_number', 'New') == 'New':
-            seq = self.env['ir.sequence'].next_by_code('budget.budget') or '0000'
-            year = fields.Date.today().year
-            vals['budget_number'] = f"{seq}/RAB-FO/ISAT-02/ENGR-PD/VII/FSI/{year}"
+    def _month_count(self, date_from, date_to):
+        return (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+
+    def get_consumption_forecast(self, date=False):
+        # dibaca dari bucket bulanan budget.consumption.period, bukan dari PO line
+        date = fields.Date.to_date(date) or fields.Date.today()
+        budgets = self.filtered('id')
+        months = defaultdict(list)
+        for budget, period, committed, paid in self.env['budget.consumption.period']._read_group(
+            [('budget_id', 'in', budgets.ids), ('period', '<=', date)],
+            ['budget_id', 'period:month'],
+            ['committed_amount:sum', 'paid_amount:sum'],
+        ):
+            months[budget.id].append({
+                'period': fields.Date.to_string(period),
+                'committed': committed,
+                'paid': paid,
+            })
+        plans = dict(self.env['budget.item']._read_group(
+            [('budget_id', 'in', budgets.ids), ('parent_id', '=', False)],
+            ['budget_id'], ['budget_plan:sum'],
+        ))
+
+        result = {}
+        for budget in budgets:
+            elapsed = 0
+            if date >= budget.start_periode:
+                elapsed = self._month_count(budget.start_periode, min(date, budget.end_periode))
+            remaining = max(self._month_count(date, budget.end_periode) - 1, 0) if date <= budget.end_periode else 0
+            budget_months = sorted(months[budget.id], key=lambda m: m['period'])
+            values = {
+                'months': budget_months,
+                'budget_plan': plans.get(budget, 0.0),
+                'elapsed_months': elapsed,
+                'remaining_months': remaining,
+            }
+            for measure in ('committed', 'paid'):
+                to_date = sum(month[measure] for month in budget_months)
+                burn_rate = to_date / elapsed if elapsed else 0.0
+                values[f'{measure}_to_date'] = to_date
+                values[f'{measure}_burn_rate'] = burn_rate
+                values[f'{measure}_forecast'] = to_date + burn_rate * remaining
+            result[budget.id] = values
+        return result
+
+    def _template_item_vals(self, detail):
+        return {
+            'name': detail.name,
+            'type': detail.type,
+            'check_detail': detail.check_detail,
+            'template_detail_id': detail.id,
+        }
+
+    @instrument
+    def _generate_items_from_template(self, keep_existing=False):
+        # semua parent dibuat dengan satu create, lalu semua child dengan satu create;
+        # keep_existing: item yang sudah ada (dicocokkan dari nama) dipertahankan
+        Item = self.env['budget.item']
+        budgets = self.filtered('template_id')
+
+        existing = {}
+        if keep_existing:
+            for item in budgets.item_ids:
+                existing[item.budget_id.id, item.parent_id.name or False, item.name] = item
+
+        matched = {}
+        parent_ids = {}
+        parent_vals, parent_keys, child_details = [], [], []
+        for budget in budgets:
+            for detail in budget.template_id.detail_ids:
+                if detail.parent_id:
+                    child_details.append((budget, detail))
+                    continue
+                item = existing.get((budget.id, False, detail.name))
+                if item:
+                    matched[item] = detail
+                    parent_ids[budget.id, detail.id] = item.id
+                else:
+                    parent_vals.append({'budget_id': budget.id, **self._template_item_vals(detail)})
+                    parent_keys.append((budget.id, detail.id))
 
-        vals.pop('item_ids', None)
-        budget = super().create(vals)
-        budget._generate_items_from_template()
-        return budget
+        for key, item in zip(parent_keys, Item.create(parent_vals)):
+            parent_ids[key] = item.id
+
+        child_vals = []
+        for budget, detail in child_details:
+            parent_id = parent_ids.get((budget.id, detail.parent_id.id))
+            if not parent_id:
+                continue
+            item = existing.get((budget.id, detail.parent_id.name, detail.name))
+            if item:
+                matched[item] = detail
+            else:
+                child_vals.append({
+                    'budget_id': budget.id,
+                    'parent_id': parent_id,
+                    **self._template_item_vals(detail),
+                })
+        Item.create(child_vals)
+
+        if keep_existing:
+            for item, detail in matched.items():
+                if (item.template_detail_id != detail or item.type != detail.type
+                        or item.check_detail != detail.check_detail):
+                    item.write(self._template_item_vals(detail))
+
+            # item yang tidak ada di template baru hanya dihapus jika belum dipakai
+            obsolete = Item.union(*existing.values()) - Item.union(*matched)
+            removable = obsolete.filtered(lambda i: i.parent_id and not i.line_ids and not i.purchase_line_ids)
+            removable |= obsolete.filtered(
+                lambda i: not i.parent_id and not i.line_ids and not i.purchase_line_ids
+                and not (i.child_ids - removable)
+            )
+            removable.unlink()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        year = fields.Date.today().year
+        for vals in vals_list:
+            if vals.get('budget_number', 'New') == 'New':
+                seq = self.env['ir.sequence'].next_by_code('budget.budget') or '0000'
+                vals['budget_number'] = f"{seq}/RAB-FO/ISAT-02/ENGR-PD/VII/FSI/{year}"
+
+            # item hanya dibentuk dari template, preview onchange tidak disimpan
+            vals.pop('item_ids', None)
+            vals.pop('top_item_ids', None)
+        budgets = super().create(vals_list)
+        if not self.env.context.get('budget_skip_template_items'):
+            budgets._generate_items_from_template()
+        return budgets
 
     def write(self, vals):
         template_changed = 'template_id' in vals
+        if template_changed:
+            # preview dari onchange tidak dipakai, item dibentuk ulang dari template
+            vals.pop('item_ids', None)
+            vals.pop('top_item_ids', None)
         res = super().write(vals)
         if template_changed:
-            for rec in self:
-                rec.item_ids.unlink()
-                rec._generate_items_from_template()
+            replace = self.filtered(lambda b: b.template_update_mode == 'replace')
+            replace.item_ids.unlink()
+            replace._generate_items_from_template()
+            (self - replace)._generate_items_from_template(keep_existing=True)
         return res
 
+    def get_item_tree(self, parent_id=False, offset=0, limit=80):
+        # satu level hierarki per panggilan, hanya field stored
+        self.ensure_one()
+        Item = self.env['budget.item']
+        domain = [('budget_id', '=', self.id), ('parent_id', '=', parent_id)]
+        items = Item.search(domain, offset=offset, limit=limit)
+        child_counts = dict(Item._read_group([('parent_id', 'in', items.ids)], ['parent_id'], ['__count']))
+        records = items.read(ITEM_TREE_FIELDS)
+        for item, values in zip(items, records):
+            values['child_count'] = child_counts.get(item, 0)
+        return {
+            'records': records,
+            'length': Item.search_count(domain) if len(items) == limit or offset else len(items),
+        }
+
+    def action_view_items(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Budget Items',
+            'res_model': 'budget.item',
+            'view_mode': 'list,form',
+            'domain': [('budget_id', '=', self.id), ('parent_id', '=', False)],
+            'context': {'default_budget_id': self.id},
+            'target': 'current',
+        }
+
+    def action_rollover(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Rollover Budget',
+            'res_model': 'budget.rollover',
+            'view_mode': 'form',
+            'context': {'default_budget_id': self.id},
+            'target': 'new',
+        }
+
+    def action_import_lines(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Import Budget Lines',
+            'res_model': 'budget.import',
+            'view_mode': 'form',
+            'context': {'default_budget_id': self.id},
+            'target': 'new',
+        }
+
     @api.onchange('template_id')
     def _onchange_template_id(self):
+        if self.template_update_mode == 'merge':
+            return
         if self.template_id:
+            # preview hanya level atas, sama dengan isi page Item List
             preview_items = self.env['budget.item']
-            for detail in self.template_id.detail_ids:
+            for detail in self.template_id.detail_ids.filtered(lambda d: not d.parent_id):
                 preview_items += self.env['budget.item'].new({
                     'budget_id': self.id or False,
                     'parent_id': False,
@@ -79,27 +314,29 @@ class Budget(models.Model):
                     'check_detail': detail.check_detail,
                     'is_parent': detail.is_parent,
                 })
-            self.item_ids = preview_items
+            self.top_item_ids = preview_items
         else:
-            self.item_ids = False
+            self.top_item_ids = False
 
 class BudgetItem(models.Model):
     _name = 'budget.item'
     _description = 'Budget Item'
     _order = 'code'
     _rec_name = 'display_name'
+    _parent_store = True
 
-    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade")
+    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade", index=True)
     code = fields.Char(string="Code", default='New', readonly=True)
     name = fields.Char(string="Budget Item", required=True)
-    parent_id = fields.Many2one('budget.item', string="Parent", domain="[('parent_id', '=', False), ('budget_id', '=', budget_id)]", ondelete="cascade")
+    parent_id = fields.Many2one('budget.item', string="Parent", domain="[('parent_id', '=', False), ('budget_id', '=', budget_id)]", ondelete="cascade", index=True)
     child_ids = fields.One2many('budget.item', 'parent_id', string="Children")
+    parent_path = fields.Char(index=True)
 
-    budget_plan = fields.Float(string="Budget Plan", compute="_compute_budget_plan", store=True)
-    request = fields.Float(string="Request", digits=(16, 2), compute="_compute_request", store=True)
-    remaining = fields.Float(string="Remaining", compute="_compute_remaining", store=True)
-    over_budget = fields.Float(string="Over Budget", compute="_compute_over_budget", store=True)
-    actual = fields.Float(string="Actual", digits=(16, 2), compute="_compute_actual", store=True)
+    budget_plan = fields.Float(string="Budget Plan", compute="_compute_amounts", store=True)
+    request = fields.Float(string="Request", digits=(16, 2), compute="_compute_amounts", store=True)
+    remaining = fields.Float(string="Remaining", compute="_compute_amounts", store=True)
+    over_budget = fields.Float(string="Over Budget", compute="_compute_amounts", store=True)
+    actual = fields.Float(string="Actual", digits=(16, 2), compute="_compute_amounts", store=True)
 
     type = fields.Char(string="Type", required=True)
     approved = fields.Boolean('Need Approve', default=False)
@@ -111,12 +348,16 @@ class BudgetItem(models.Model):
         store=True
     )
 
+    child_code_counter = fields.Integer(string="Last Child Code", readonly=True, copy=False)
+    template_detail_id = fields.Many2one('template.detail', string="Template Detail", ondelete="set null", readonly=True)
+
     line_ids = fields.One2many("budget.item.line", "item_id", string="Lines")
     memo_over_budget_ids = fields.Many2many('memo.over.budget', compute="_compute_memo_over_budget_ids", string="Budget Revision", store=False)
     purchase_line_ids = fields.One2many(
         'purchase.order.line', 'budget_item_id',
         string="Purchase Lines"
     )
+    consumption_ids = fields.One2many('budget.consumption', 'item_id', string="Consumption")
 
     request_purchase_ids = fields.One2many(
         'purchase.order.line', compute="_compute_request_purchase_ids",
@@ -128,6 +369,13 @@ class BudgetItem(models.Model):
         string="Actual Detail"
     )
 
+    _sql_constraints = [
+        ('budget_code_uniq', 'unique(budget_id, code)', 'Kode budget item harus unik per budget.'),
+    ]
+
+    def init(self):
+        create_index(self.env.cr, 'budget_item_budget_parent_code_index', self._table, ['budget_id', 'parent_id', 'code'])
+
     @api.depends('code', 'name')
     def _compute_display_name(self):
         for rec in self:
@@ -139,128 +387,228 @@ class BudgetItem(models.Model):
             rec.is_parent = not bool(rec.parent_id)
 
     @api.model
-    def create(self, vals):
-        if vals.get('code', 'New') == 'New':
-            budget_id = vals.get('budget_id')
-            if not budget_id:
-                return super().create(vals)
-
-            budget = self.env['budget.budget'].browse(budget_id)
-            prefix = budget.budget_number.split('/')[0] if budget.budget_number else '0000'
-
-            if not vals.get('parent_id'):
-                last_parent = self.search([
-                    ('budget_id', '=', budget.id),
-                    ('parent_id', '=', False)
-                ], order='code desc', limit=1)
-
-                if last_parent and last_parent.code:
-                    try:
-                        last_num = int(last_parent.code.split('-')[-1])
-                    except ValueError:
-                        last_num = 0
-                    new_num = last_num + 100
-                else:
-                    new_num = 100
-
-                vals['code'] = f"{prefix}/RAB-FO-{new_num:04d}"
-            else:
-                parent = self.env['budget.item'].browse(vals['parent_id'])
-                last_child = self.search([('parent_id', '=', parent.id)], order='code desc', limit=1)
-
-                if last_child and last_child.code:
-                    try:
-                        last_num = int(last_child.code.split('-')[-1])
-                    except ValueError:
-                        last_num = int(parent.code.split('-')[-1])
-                    new_num = last_num + 1
-                else:
-                    new_num = int(parent.code.split('-')[-1]) + 1
-
-                vals['code'] = f"{prefix}/RAB-FO-{new_num:04d}"
-
-        return super().create(vals)
-
-    @api.depends('child_ids.budget_plan', 'line_ids.subtotal')
-    def _compute_budget_plan(self):
-        for rec in self:
-            if rec.child_ids:
-                rec.budget_plan = sum(child.budget_plan for child in rec.child_ids)
-            else:
-                rec.budget_plan = sum(line.subtotal for line in rec.line_ids)
-
-    @api.depends('budget_plan', 'request', 'child_ids.remaining')
-    def _compute_remaining(self):
-        for rec in self:
-            if rec.child_ids:
-                rec.remaining = sum(child.remaining for child in rec.child_ids)
+    def _code_number(self, code, default=0):
+        try:
+            return int(code.split('-')[-1])
+        except (AttributeError, ValueError):
+            return default
+
+    def _seed_parent_counter(self, budgets):
+        last_codes = dict(self._read_group(
+            [('budget_id', 'in', budgets.ids), ('parent_id', '=', False)],
+            ['budget_id'], ['code:max'],
+        ))
+        return {
+            budget.id: self._code_number(last_codes[budget]) if last_codes.get(budget) else 0
+            for budget in budgets
+        }
+
+    def _seed_child_counter(self, parents):
+        last_codes = dict(self._read_group(
+            [('parent_id', 'in', parents.ids)], ['parent_id'], ['code:max'],
+        ))
+        seeds = {}
+        for parent in parents:
+            parent_num = self._code_number(parent.code)
+            if last_codes.get(parent):
+                seeds[parent.id] = self._code_number(last_codes[parent], parent_num)
             else:
-                rec.remaining = rec.budget_plan - rec.request
-
-    @api.depends('budget_plan', 'actual', 'child_ids.over_budget')
-    def _compute_over_budget(self):
-        for rec in self:
-            if rec.child_ids:
-                rec.over_budget = sum(child.over_budget for child in rec.child_ids)
-            else:
-                rec.over_budget = max(0, rec.actual - rec.budget_plan)
+                seeds[parent.id] = parent_num
+        return seeds
+
+    def _assign_codes(self, vals_list):
+        # nomor diambil dari counter per budget (parent) dan per parent (child)
+        budgets = self.env['budget.budget'].browse({vals['budget_id'] for vals in vals_list})
+        prefixes = {
+            budget.id: budget.budget_number.split('/')[0] if budget.budget_number else '0000'
+            for budget in budgets
+        }
+
+        parent_vals = [vals for vals in vals_list if not vals.get('parent_id')]
+        child_vals = [vals for vals in vals_list if vals.get('parent_id')]
+
+        if parent_vals:
+            counts = Counter(vals['budget_id'] for vals in parent_vals)
+            last_nums = reserve_code_numbers(
+                budgets.browse(list(counts)), 'item_code_counter', counts, self._seed_parent_counter, 100,
+            )
+            for vals in parent_vals:
+                budget_id = vals['budget_id']
+                last_nums[budget_id] += 100
+                vals['code'] = f"{prefixes[budget_id]}/RAB-FO-{last_nums[budget_id]:04d}"
+
+        if child_vals:
+            counts = Counter(vals['parent_id'] for vals in child_vals)
+            last_nums = reserve_code_numbers(
+                self.browse(list(counts)), 'child_code_counter', counts, self._seed_child_counter, 1,
+            )
+            check_child_capacity(
+                self.browse(list(counts)), last_nums, counts,
+                lambda parent: self._code_number(parent.code), "Budget item",
+            )
+            for vals in child_vals:
+                parent_id = vals['parent_id']
+                last_nums[parent_id] += 1
+                vals['code'] = f"{prefixes[vals['budget_id']]}/RAB-FO-{last_nums[parent_id]:04d}"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_code = [
+            vals for vals in vals_list
+            if vals.get('code', 'New') == 'New' and vals.get('budget_id')
+        ]
+        if to_code:
+            self._assign_codes(to_code)
+        return super().create(vals_list)
+
+    def _own_amounts(self):
+        budget_plan = sum(self.line_ids.mapped('subtotal'))
+        request = sum(self.consumption_ids.mapped('committed_amount'))
+        actual = sum(self.consumption_ids.mapped('paid_amount'))
+        return {
+            'budget_plan': budget_plan,
+            'request': request,
+            'remaining': budget_plan - request,
+            'over_budget': max(0, actual - budget_plan),
+            'actual': actual,
+        }
+
+    def _rollup_amounts(self):
+        # jumlahkan semua leaf di bawah tiap parent sekaligus lewat parent_path
+        totals = {
+            rec.id: dict.fromkeys(('budget_plan', 'request', 'remaining', 'over_budget', 'actual'), 0.0)
+            for rec in self
+        }
+        domain = expression.OR([[('parent_path', '=like', f'{rec.parent_path}%')] for rec in self])
+        leaves = self.search(expression.AND([domain, [('child_ids', '=', False)]]))
+        for leaf in leaves:
+            ancestor_ids = [int(anc_id) for anc_id in leaf.parent_path.split('/')[:-2]]
+            for anc_id in ancestor_ids:
+                if anc_id in totals:
+                    for fname, total in totals[anc_id].items():
+                        totals[anc_id][fname] = total + leaf[fname]
+        return totals
+
+    @api.depends(
+        'line_ids.subtotal', 'consumption_ids.committed_amount', 'consumption_ids.paid_amount',
+        'child_ids.budget_plan', 'child_ids.request', 'child_ids.actual',
+    )
+    @instrument
+    def _compute_amounts(self):
+        # leaf dihitung lebih dulu supaya rollup parent membaca nilai terbaru
+        leaves = self.filtered(lambda rec: not rec.child_ids)
+        for rec in leaves:
+            rec.update(rec._own_amounts())
+
+        parents = self - leaves
+        stored_parents = parents.filtered(lambda rec: rec.id and rec.parent_path)
+        totals = stored_parents._rollup_amounts() if stored_parents else {}
+        for rec in stored_parents:
+            rec.update(totals[rec.id])
+        for rec in parents - stored_parents:
+            rec.update({
+                fname: sum(rec.child_ids.mapped(fname))
+                for fname in ('budget_plan', 'request', 'remaining', 'over_budget', 'actual')
+            })
+
+    def action_view_children(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.display_name,
+            'res_model': 'budget.item',
+            'view_mode': 'list,form',
+            'domain': [('parent_id', '=', self.id)],
+            'context': {'default_budget_id': self.budget_id.id, 'default_parent_id': self.id},
+            'target': 'current',
+        }
+
+    def _action_view_purchase_lines(self, name, domain):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': name,
+            'res_model': 'purchase.order.line',
+            'view_mode': 'list',
+            'domain': [('budget_item_id', '=', self.id)] + domain,
+            'context': {'create': False},
+            'target': 'current',
+        }
+
+    def action_view_request_lines(self):
+        return self._action_view_purchase_lines(
+            'Request Detail', [('is_committed', '=', True)],
+        )
+
+    def action_view_actual_lines(self):
+        return self._action_view_purchase_lines(
+            'Actual Detail', [('is_paid', '=', True)],
+        )
+
+    def action_view_memos(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Budget Revision',
+            'res_model': 'memo.over.budget',
+            'view_mode': 'list,form',
+            'domain': [
+                '|', ('line_ids.budget_item_id', '=', self.id),
+                ('purchase_order_id.order_line.budget_item_id', '=', self.id),
+            ],
+            'context': {'create': False},
+            'target': 'current',
+        }
 
     #berhubungan dengan purchase
+    def _grouped_purchase_lines(self, domain):
+        lines = self.env['purchase.order.line'].search(
+            [('budget_item_id', 'in', self._origin.ids)] + domain
+        )
+        grouped = defaultdict(lambda: self.env['purchase.order.line'])
+        for line in lines:
+            grouped[line.budget_item_id.id] |= line
+        return grouped
+
+    @instrument
     def _compute_request_purchase_ids(self):
+        grouped = self._grouped_purchase_lines([('is_committed', '=', True)])
         for rec in self:
-            rec.request_purchase_ids = rec.purchase_line_ids.filtered(
-                lambda l: l.order_id.state in ['draft', 'sent', 'to approve', 'purchase']
-            )
+            rec.request_purchase_ids = grouped[rec._origin.id]
 
+    @instrument
     def _compute_actual_purchase_ids(self):
+        grouped = self._grouped_purchase_lines([('is_paid', '=', True)])
         for rec in self:
-            rec.actual_purchase_ids = rec.purchase_line_ids.filtered(
-                lambda l: any(inv.payment_state == 'paid' for inv in l.order_id.invoice_ids)
-            )
-
-    @api.depends('child_ids.request', 'purchase_line_ids.price_subtotal', 'purchase_line_ids.order_id.state')
-    def _compute_request(self):
-        for rec in self:
-            if rec.child_ids:
-                rec.request = sum(child.request for child in rec.child_ids)
-            else:
-                purchase_lines = rec.purchase_line_ids.filtered(
-                    lambda l: l.order_id.state in ['purchase', 'done']
-                )
-                rec.request = sum(purchase_lines.mapped('price_subtotal'))
-
-    @api.depends('child_ids.actual', 'purchase_line_ids.order_id.invoice_ids.payment_state')
-    def _compute_actual(self):
-        for rec in self:
-            if rec.child_ids:
-                rec.actual = sum(child.actual for child in rec.child_ids)
-            else:
-                paid_purchase_lines = rec.purchase_line_ids.filtered(
-                    lambda l: any(inv.payment_state == 'paid' for inv in l.order_id.invoice_ids)
-                )
-                rec.actual = sum(paid_purchase_lines.mapped('price_subtotal'))
+            rec.actual_purchase_ids = grouped[rec._origin.id]
 
     #berhubungan dengan memo
     @api.depends('purchase_line_ids')
+    @instrument
     def _compute_memo_over_budget_ids(self):
-        for item in self:
-            purchase_orders = item.purchase_line_ids.mapped('order_id')
-
-            memos = purchase_orders.mapped('memo_over_budget_id')
-
-            memo_lines = self.env['memo.over.budget.line'].search([
-                ('budget_item_id', '=', item.id)
-            ])
-            memos |= memo_lines.mapped('memo_id')
+        memos = defaultdict(lambda: self.env['memo.over.budget'])
+        purchase_lines = self.env['purchase.order.line'].search([
+            ('budget_item_id', 'in', self._origin.ids),
+            ('order_id.memo_over_budget_id', '!=', False),
+        ])
+        for line in purchase_lines:
+            memos[line.budget_item_id.id] |= line.order_id.memo_over_budget_id
+
+        memo_lines = self.env['memo.over.budget.line'].search([
+            ('budget_item_id', 'in', self._origin.ids)
+        ])
+        for memo_line in memo_lines:
+            memos[memo_line.budget_item_id.id] |= memo_line.memo_id
 
-            item.memo_over_budget_ids = memos
+        for item in self:
+            item.memo_over_budget_ids = memos[item._origin.id]
 
 class BudgetItemLine(models.Model):
     _name = 'budget.item.line'
     _description = 'Budget Item Line'
 
-    item_id = fields.Many2one('budget.item', string="Budget Item", required=True, ondelete="cascade")
-    product_id = fields.Many2one('product.product', string="Product")
+    item_id = fields.Many2one('budget.item', string="Budget Item", required=True, ondelete="cascade", index=True)
+    product_id = fields.Many2one('product.product', string="Product", index=True)
     name = fields.Char(string="Name")
     uom_id = fields.Many2one('uom.uom', string="Unit of Measure", store=True)
     qty_plan = fields.Float(string="Qty Plan")
@@ -272,13 +620,25 @@ class BudgetItemLine(models.Model):
     subtotal = fields.Float(string="Subtotal", compute="_compute_subtotal", store=True)
     remark = fields.Char(string="Remark")
 
-    @api.model
-    def create(self, vals):
-        if 'qty_plan' in vals and 'initial_qty_plan' not in vals:
-            vals['initial_qty_plan'] = vals['qty_plan']
-        if 'unit_price' in vals and not vals.get('initial_unit_price'):
-            vals['initial_unit_price'] = vals['unit_price']
-        return super().create(vals)
+    def init(self):
+        create_index(self.env.cr, 'budget_item_line_item_product_index', self._table, ['item_id', 'product_id'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_price = [vals for vals in vals_list if vals.get('product_id') and 'unit_price' not in vals]
+        if to_price:
+            prices = self._resolve_unit_prices(
+                self.env['product.product'].browse({vals['product_id'] for vals in to_price})
+            )
+            for vals in to_price:
+                vals['unit_price'] = prices[vals['product_id']]
+
+        for vals in vals_list:
+            if 'qty_plan' in vals and 'initial_qty_plan' not in vals:
+                vals['initial_qty_plan'] = vals['qty_plan']
+            if 'unit_price' in vals and not vals.get('initial_unit_price'):
+                vals['initial_unit_price'] = vals['unit_price']
+        return super().create(vals_list)
 
     @api.depends('qty_plan', 'qty_used')
     def _compute_qty_remain(self):
@@ -290,37 +650,61 @@ class BudgetItemLine(models.Model):
         for rec in self:
             rec.subtotal = rec.qty_plan * rec.unit_price
 
+    @api.model
+    def _vendor_prices(self, company, templates):
+        # harga vendor tertinggi (mata uang asli) per product template, satu query untuk seluruh batch
+        if not templates:
+            return {}
+        self.env['product.supplierinfo'].flush_model(['product_tmpl_id', 'company_id', 'price', 'currency_id'])
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT ON (product_tmpl_id) product_tmpl_id, price, currency_id
+              FROM product_supplierinfo
+             WHERE product_tmpl_id IN %s
+               AND (company_id = %s OR company_id IS NULL)
+          ORDER BY product_tmpl_id, price DESC, id
+        """, tuple(templates.ids), company.id))
+        return {tmpl_id: (price, currency_id) for tmpl_id, price, currency_id in self.env.cr.fetchall()}
+
+    @api.model
+    def _resolve_unit_prices(self, products):
+        # konversi kurs dihitung sekali per mata uang untuk seluruh batch
+        company = self.env.company
+        company_currency = company.currency_id
+        today = fields.Date.today()
+        rates = {}
+        prices = {}
+        vendor_prices = self._vendor_prices(company, products.product_tmpl_id)
+        for product in products:
+            data = vendor_prices.get(product.product_tmpl_id.id)
+            if not data:
+                prices[product.id] = product.standard_price
+                continue
+            price, currency_id = data
+            currency_id = currency_id or company_currency.id
+            if currency_id not in rates:
+                currency = self.env['res.currency'].browse(currency_id)
+                rates[currency_id] = currency._get_conversion_rate(currency, company_currency, company, today)
+            prices[product.id] = company_currency.round(price * rates[currency_id])
+        return prices
+
     @api.onchange('product_id')
     def _onchange_product_id(self):
+        prices = self._resolve_unit_prices(self.product_id)
         for rec in self:
             if rec.product_id:
                 rec.name = rec.product_id.display_name
                 rec.uom_id = rec.product_id.uom_id.id
-
-                vendors = rec.env['product.supplierinfo'].search([
-                    ('product_tmpl_id', '=', rec.product_id.product_tmpl_id.id)
-                ])
-
-                if vendors:
-                    vendor = max(vendors, key=lambda v: v.price)
-                    price = vendor.price
-
-                    vendor_currency = vendor.currency_id or rec.env.company.currency_id
-                    company_currency = rec.env.company.currency_id
-                    rec.unit_price = vendor_currency._convert(
-                        price, company_currency, rec.env.company, fields.Date.today()
-                    )
-                else:
-                    rec.unit_price = rec.product_id.standard_price
+                rec.unit_price = prices[rec.product_id.id]
 
     #berhubungan dengan purchase
-    @api.depends('product_id', 'item_id.purchase_line_ids.order_id.state', 'item_id.purchase_line_ids.product_qty')
+    @api.depends('product_id', 'item_id.consumption_ids.committed_qty')
+    @instrument
     def _compute_qty_used(self):
         for rec in self:
             qty = 0.0
             if rec.product_id and rec.item_id:
-                purchase_lines = rec.item_id.purchase_line_ids.filtered(
-                    lambda l: l.product_id.id == rec.product_id.id and l.order_id.state in ['purchase', 'done']
+                consumption = rec.item_id.consumption_ids.filtered(
+                    lambda c: c.product_id == rec.product_id
                 )
-                qty = sum(purchase_lines.mapped('product_qty'))
+                qty = sum(consumption.mapped('committed_qty'))
             rec.qty_used = qty
\ No newline at end of file
@@ -0,0 +1,149 @@
+from odoo import models, fields, api
+
+CONSOLIDATION_MEASURES = ('budget_plan', 'request', 'actual')
+
+
+class BudgetConsolidation(models.Model):
+    _name = 'budget.consolidation'
+    _description = 'Budget Consolidation'
+
+    name = fields.Char(string="Name", required=True)
+    company_ids = fields.Many2many('res.company', string="Companies", default=lambda self: self.env.company)
+    budget_ids = fields.Many2many(
+        'budget.budget', string="Budgets",
+        domain="[('company_id', 'in', company_ids)]",
+    )
+    currency_id = fields.Many2one(
+        'res.currency', string="Currency", required=True,
+        default=lambda self: self.env.company.currency_id,
+    )
+    rate_date_mode = fields.Selection([
+        ('fixed', 'Consolidation Date'),
+        ('periode', 'Budget Start Periode (Month)'),
+    ], string="Rate Date", default='fixed', required=True)
+    date = fields.Date(string="Rate Date", default=fields.Date.today, required=True)
+    line_ids = fields.One2many('budget.consolidation.line', 'consolidation_id', string="Lines")
+    last_refresh = fields.Datetime(string="Last Refresh", readonly=True)
+
+    budget_plan = fields.Float(string="Budget Plan", digits=(16, 2), compute="_compute_totals", store=True)
+    request = fields.Float(string="Request", digits=(16, 2), compute="_compute_totals", store=True)
+    actual = fields.Float(string="Actual", digits=(16, 2), compute="_compute_totals", store=True)
+    remaining = fields.Float(string="Remaining", digits=(16, 2), compute="_compute_totals", store=True)
+
+    @api.depends('line_ids.budget_plan', 'line_ids.request', 'line_ids.actual')
+    def _compute_totals(self):
+        for rec in self:
+            for fname in CONSOLIDATION_MEASURES:
+                rec[fname] = sum(rec.line_ids.mapped(fname))
+            rec.remaining = rec.budget_plan - rec.request
+
+    def _rate_date(self, budget):
+        if self.rate_date_mode == 'periode':
+            return budget.start_periode.replace(day=1)
+        return self.date
+
+    def _source_totals(self, budgets):
+        # satu _read_group untuk semua budget: item level atas sudah berisi rollup child
+        rows = self.env['budget.item']._read_group(
+            [('budget_id', 'in', budgets.ids), ('parent_id', '=', False)],
+            ['budget_id'],
+            [f'{fname}:sum' for fname in CONSOLIDATION_MEASURES],
+        )
+        return {budget.id: values for budget, *values in rows}
+
+    def _source_stamps(self, budgets):
+        # penanda perubahan budget sumber: write_date terakhir dari budget atau item level atas
+        stamps = dict(self.env['budget.item']._read_group(
+            [('budget_id', 'in', budgets.ids), ('parent_id', '=', False)],
+            ['budget_id'], ['write_date:max'],
+        ))
+        return {
+            budget.id: max(filter(None, [budget.write_date, stamps.get(budget)]))
+            for budget in budgets
+        }
+
+    def _refresh_lines(self, budgets, rates):
+        self.ensure_one()
+        totals = self._source_totals(budgets)
+        stamps = self._source_stamps(budgets)
+        lines_by_budget = {line.budget_id.id: line for line in self.line_ids}
+        to_create = []
+        for budget in budgets:
+            amounts = totals.get(budget.id, [0.0] * len(CONSOLIDATION_MEASURES))
+            source_currency = budget.currency_id or budget.company_id.currency_id
+            company = budget.company_id or self.env.company
+            rate_date = self._rate_date(budget)
+            # kurs dihitung sekali per (mata uang, company, tanggal) untuk seluruh refresh
+            rate_key = (source_currency.id, company.id, rate_date)
+            if rate_key not in rates:
+                rates[rate_key] = source_currency._get_conversion_rate(
+                    source_currency, self.currency_id, company, rate_date,
+                )
+            rate = rates[rate_key]
+            vals = {
+                'currency_id': source_currency.id,
+                'target_currency_id': self.currency_id.id,
+                'rate': rate,
+                'rate_date': rate_date,
+                'source_write_date': stamps[budget.id],
+                **{f'source_{fname}': amount for fname, amount in zip(CONSOLIDATION_MEASURES, amounts)},
+                **{fname: self.currency_id.round(amount * rate) for fname, amount in zip(CONSOLIDATION_MEASURES, amounts)},
+            }
+            line = lines_by_budget.get(budget.id)
+            if line:
+                line.write(vals)
+            else:
+                to_create.append({'consolidation_id': self.id, 'budget_id': budget.id, **vals})
+        if to_create:
+            self.env['budget.consolidation.line'].create(to_create)
+
+    def action_refresh(self, full=False):
+        # incremental: hanya budget sumber yang berubah sejak refresh terakhir yang dihitung ulang
+        rates = {}
+        for rec in self:
+            rec.line_ids.filtered(lambda l: l.budget_id not in rec.budget_ids).unlink()
+            budgets = rec.budget_ids
+            if not full:
+                stamps = rec._source_stamps(budgets)
+                lines_by_budget = {line.budget_id: line for line in rec.line_ids}
+                budgets = budgets.filtered(
+                    lambda b: b not in lines_by_budget
+                    or lines_by_budget[b].source_write_date != stamps[b.id]
+                    or lines_by_budget[b].rate_date != rec._rate_date(b)
+                    or lines_by_budget[b].target_currency_id != lines_by_budget[b].consolidation_currency_id
+                )
+            if budgets:
+                rec._refresh_lines(budgets, rates)
+            rec.last_refresh = fields.Datetime.now()
+        return True
+
+    def action_refresh_full(self):
+        return self.action_refresh(full=True)
+
+
+class BudgetConsolidationLine(models.Model):
+    _name = 'budget.consolidation.line'
+    _description = 'Budget Consolidation Line'
+    _order = 'consolidation_id, budget_id'
+
+    consolidation_id = fields.Many2one('budget.consolidation', string="Consolidation", required=True, ondelete="cascade", index=True)
+    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade", index=True)
+    company_id = fields.Many2one(related='budget_id.company_id', store=True)
+    currency_id = fields.Many2one('res.currency', string="Source Currency", readonly=True)
+    target_currency_id = fields.Many2one('res.currency', string="Target Currency", readonly=True)
+    consolidation_currency_id = fields.Many2one(related='consolidation_id.currency_id')
+    rate = fields.Float(string="Rate", digits=(12, 6), readonly=True)
+    rate_date = fields.Date(string="Rate Date", readonly=True)
+    source_write_date = fields.Datetime(readonly=True)
+
+    source_budget_plan = fields.Float(string="Budget Plan (Source)", digits=(16, 2), readonly=True)
+    source_request = fields.Float(string="Request (Source)", digits=(16, 2), readonly=True)
+    source_actual = fields.Float(string="Actual (Source)", digits=(16, 2), readonly=True)
+    budget_plan = fields.Float(string="Budget Plan", digits=(16, 2), readonly=True)
+    request = fields.Float(string="Request", digits=(16, 2), readonly=True)
+    actual = fields.Float(string="Actual", digits=(16, 2), readonly=True)
+
+    _sql_constraints = [
+        ('consolidation_budget_uniq', 'unique(consolidation_id, budget_id)',
+         'Budget hanya boleh muncul sekali per konsolidasi.'),
+    ]
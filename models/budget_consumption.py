@@ -0,0 +1,224 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+from .budget import lock_rows
+from .budget_perf_stat import instrument
+from .purchase import PLAN_STATES
+
+class BudgetConsumption(models.Model):
+    _name = 'budget.consumption'
+    _description = 'Budget Consumption'
+
+    item_id = fields.Many2one('budget.item', string="Budget Item", required=True, ondelete="cascade", index=True)
+    product_id = fields.Many2one('product.product', string="Product", required=True, ondelete="cascade")
+    committed_count = fields.Integer(string="Committed Lines")
+    committed_qty = fields.Float(string="Committed Qty")
+    committed_amount = fields.Float(string="Committed Amount", digits=(16, 2))
+    max_price = fields.Float(string="Max Committed Price")
+    paid_amount = fields.Float(string="Paid Amount", digits=(16, 2))
+
+    _sql_constraints = [
+        ('item_product_uniq', 'unique(item_id, product_id)',
+         'Consumption untuk budget item dan product ini sudah ada.'),
+    ]
+
+    def _domain_for_keys(self, keys, item_field, product_field):
+        return [
+            (item_field, 'in', list({item_id for item_id, _product_id in keys})),
+            (product_field, 'in', list({product_id for _item_id, product_id in keys})),
+        ]
+
+    @api.model
+    def _read_consumption(self, keys):
+        ledgers = self.sudo().search(self._domain_for_keys(keys, 'item_id', 'product_id'))
+        return {
+            (ledger.item_id.id, ledger.product_id.id): ledger
+            for ledger in ledgers
+            if (ledger.item_id.id, ledger.product_id.id) in keys
+        }
+
+    @api.model
+    @instrument
+    def _refresh(self, keys):
+        # hitung ulang hanya pasangan (budget item, product) yang tersentuh
+        if not keys:
+            return
+        keys = set(keys)
+        values = {
+            key: {
+                'committed_count': 0,
+                'committed_qty': 0.0,
+                'committed_amount': 0.0,
+                'max_price': 0.0,
+                'paid_amount': 0.0,
+            }
+            for key in keys
+        }
+
+        PurchaseLine = self.env['purchase.order.line'].sudo()
+        domain = self._domain_for_keys(keys, 'budget_item_id', 'product_id')
+        committed = PurchaseLine._read_group(
+            domain + [('order_id.state', 'in', PLAN_STATES)],
+            ['budget_item_id', 'product_id'],
+            ['__count', 'product_qty:sum', 'price_subtotal:sum', 'price_unit:max'],
+        )
+        for item, product, count, qty, amount, max_price in committed:
+            if (item.id, product.id) in values:
+                values[item.id, product.id].update({
+                    'committed_count': count,
+                    'committed_qty': qty,
+                    'committed_amount': amount,
+                    'max_price': max_price,
+                })
+
+        paid = PurchaseLine._read_group(
+            domain + [('is_paid', '=', True)],
+            ['budget_item_id', 'product_id'],
+            ['price_subtotal:sum'],
+        )
+        for item, product, amount in paid:
+            if (item.id, product.id) in values:
+                values[item.id, product.id]['paid_amount'] = amount
+
+        existing = self._read_consumption(keys)
+        to_create = []
+        to_write = {}
+        for key in sorted(values):
+            vals = values[key]
+            ledger = existing.get(key)
+            if not ledger:
+                if any(vals.values()):
+                    to_create.append({'item_id': key[0], 'product_id': key[1], **vals})
+                continue
+            changed = {fname: value for fname, value in vals.items() if ledger[fname] != value}
+            if changed:
+                to_write[ledger] = changed
+
+        if to_write:
+            lock_rows(self.sudo().union(*to_write))
+            for ledger in sorted(to_write, key=lambda l: l.id):
+                ledger.write(to_write[ledger])
+        if to_create:
+            self.sudo().create(to_create)
+
+        self.env['budget.consumption.period']._refresh(keys)
+
+
+class BudgetConsumptionPeriod(models.Model):
+    _name = 'budget.consumption.period'
+    _description = 'Budget Consumption per Month'
+    _order = 'period, id'
+
+    item_id = fields.Many2one('budget.item', string="Budget Item", required=True, ondelete="cascade", index=True)
+    budget_id = fields.Many2one(related='item_id.budget_id', store=True, index=True)
+    product_id = fields.Many2one('product.product', string="Product", required=True, ondelete="cascade")
+    period = fields.Date(string="Period", required=True, index=True)
+    committed_qty = fields.Float(string="Committed Qty")
+    committed_amount = fields.Float(string="Committed Amount", digits=(16, 2))
+    paid_amount = fields.Float(string="Paid Amount", digits=(16, 2))
+
+    _sql_constraints = [
+        ('item_product_period_uniq', 'unique(item_id, product_id, period)',
+         'Consumption bulanan untuk budget item dan product ini sudah ada.'),
+    ]
+
+    @api.model
+    def _period_values(self, keys):
+        # committed per bulan konfirmasi PO, paid per bulan invoice lunas terakhir PO
+        item_ids = tuple({item_id for item_id, _product_id in keys})
+        product_ids = tuple({product_id for _item_id, product_id in keys})
+        values = {}
+        self.env['purchase.order.line'].flush_model(['budget_item_id', 'product_id', 'order_id', 'product_qty', 'price_subtotal', 'is_paid'])
+        self.env['purchase.order'].flush_model(['state', 'date_approve', 'date_order'])
+        self.env['account.move.line'].flush_model(['purchase_line_id', 'move_id'])
+        self.env['account.move'].flush_model(['payment_state', 'invoice_date'])
+        cr = self.env.cr
+        cr.execute(SQL("""
+            SELECT l.budget_item_id, l.product_id,
+                   date_trunc('month', COALESCE(o.date_approve, o.date_order))::date,
+                   SUM(l.product_qty), SUM(l.price_subtotal)
+              FROM purchase_order_line l
+              JOIN purchase_order o ON o.id = l.order_id
+             WHERE o.state IN %(states)s
+               AND l.budget_item_id IN %(item_ids)s AND l.product_id IN %(product_ids)s
+          GROUP BY 1, 2, 3
+        """, states=PLAN_STATES, item_ids=item_ids, product_ids=product_ids))
+        for item_id, product_id, period, qty, amount in cr.fetchall():
+            if (item_id, product_id) in keys:
+                values[item_id, product_id, period] = {
+                    'committed_qty': qty, 'committed_amount': amount, 'paid_amount': 0.0,
+                }
+
+        cr.execute(SQL("""
+            SELECT l.budget_item_id, l.product_id,
+                   date_trunc('month', COALESCE(paid.invoice_date, o.date_order))::date,
+                   SUM(l.price_subtotal)
+              FROM purchase_order_line l
+              JOIN purchase_order o ON o.id = l.order_id
+         LEFT JOIN LATERAL (
+                    SELECT MAX(m.invoice_date) AS invoice_date
+                      FROM purchase_order_line ol
+                      JOIN account_move_line aml ON aml.purchase_line_id = ol.id
+                      JOIN account_move m ON m.id = aml.move_id
+                     WHERE ol.order_id = l.order_id AND m.payment_state = 'paid'
+                   ) paid ON TRUE
+             WHERE l.is_paid
+               AND l.budget_item_id IN %(item_ids)s AND l.product_id IN %(product_ids)s
+          GROUP BY 1, 2, 3
+        """, item_ids=item_ids, product_ids=product_ids))
+        for item_id, product_id, period, amount in cr.fetchall():
+            if (item_id, product_id) in keys:
+                values.setdefault((item_id, product_id, period), {
+                    'committed_qty': 0.0, 'committed_amount': 0.0,
+                })['paid_amount'] = amount
+        return values
+
+    @api.model
+    def _refresh(self, keys):
+        # bucket bulanan untuk pasangan yang tersentuh dihitung ulang, sisanya tidak disentuh
+        if not keys:
+            return
+        keys = set(keys)
+        values = self._period_values(keys)
+        buckets = self.sudo().search([
+            ('item_id', 'in', list({item_id for item_id, _product_id in keys})),
+            ('product_id', 'in', list({product_id for _item_id, product_id in keys})),
+        ])
+        existing = {
+            (bucket.item_id.id, bucket.product_id.id, bucket.period): bucket
+            for bucket in buckets
+            if (bucket.item_id.id, bucket.product_id.id) in keys
+        }
+
+        obsolete = self.sudo().union(*(bucket for key, bucket in existing.items() if key not in values))
+        to_write = {}
+        to_create = []
+        for key in sorted(values):
+            vals = values[key]
+            bucket = existing.get(key)
+            if not bucket:
+                to_create.append({'item_id': key[0], 'product_id': key[1], 'period': key[2], **vals})
+                continue
+            changed = {fname: value for fname, value in vals.items() if bucket[fname] != value}
+            if changed:
+                to_write[bucket] = changed
+
+        if to_write or obsolete:
+            lock_rows(self.sudo().union(obsolete, *to_write))
+        for bucket in sorted(to_write, key=lambda b: b.id):
+            bucket.write(to_write[bucket])
+        obsolete.unlink()
+        if to_create:
+            self.sudo().create(to_create)
+
+    @api.model
+    def action_rebuild(self, batch_size=2000):
+        # isi ulang seluruh bucket, dipakai sekali untuk data yang sudah ada sebelum bucket dibuat
+        rows = self.env['purchase.order.line'].sudo()._read_group(
+            [('budget_item_id', '!=', False), ('product_id', '!=', False)],
+            ['budget_item_id', 'product_id'],
+        )
+        keys = sorted((item.id, product.id) for item, product in rows)
+        for start in range(0, len(keys), batch_size):
+            self._refresh(keys[start:start + batch_size])
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
@@ -0,0 +1,133 @@
+import csv
+import io
+
+import xlsxwriter
+
+from odoo import models
+from odoo.tools import SQL
+
+EXPORT_PAGE_SIZE = 5000
+
+ITEM_EXPORT_COLUMNS = [
+    'code', 'parent_code', 'name', 'type',
+    'budget_plan', 'request', 'actual', 'remaining', 'over_budget',
+]
+LINE_EXPORT_COLUMNS = [
+    'item_code', 'item_name', 'product', 'name', 'uom',
+    'qty_plan', 'initial_qty_plan', 'unit_price', 'initial_unit_price', 'subtotal',
+    'qty_used', 'qty_remain', 'request', 'actual', 'remark',
+]
+MEMO_EXPORT_COLUMNS = [
+    'memo', 'date', 'purchase_order', 'item_code', 'product',
+    'budget_qty', 'request_qty', 'budget_price', 'request_price', 'over_amount',
+]
+
+
+class Budget(models.Model):
+    _inherit = 'budget.budget'
+
+    def _export_pages(self, query_builder):
+        # keyset pagination (id > terakhir) agar memory tetap datar berapapun ukuran budget
+        last_id = 0
+        while True:
+            self.env.cr.execute(query_builder(last_id))
+            rows = self.env.cr.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+
+    def _export_items(self):
+        return self._export_pages(lambda last_id: SQL("""
+            SELECT i.id, i.code, p.code, i.name, i.type,
+                   i.budget_plan, i.request, i.actual, i.remaining, i.over_budget
+              FROM budget_item i
+         LEFT JOIN budget_item p ON p.id = i.parent_id
+             WHERE i.budget_id = %(budget_id)s AND i.id > %(last_id)s
+          ORDER BY i.id
+             LIMIT %(limit)s
+        """, budget_id=self.id, last_id=last_id, limit=EXPORT_PAGE_SIZE))
+
+    def _export_lines(self):
+        lang = self.env.lang or 'en_US'
+        return self._export_pages(lambda last_id: SQL("""
+            SELECT l.id, i.code, i.name,
+                   COALESCE(pp.default_code, pt.name->>%(lang)s, pt.name->>'en_US'),
+                   l.name, COALESCE(u.name->>%(lang)s, u.name->>'en_US'),
+                   l.qty_plan, l.initial_qty_plan, l.unit_price, l.initial_unit_price, l.subtotal,
+                   l.qty_used, l.qty_remain,
+                   COALESCE(c.committed_amount, 0), COALESCE(c.paid_amount, 0), l.remark
+              FROM budget_item_line l
+              JOIN budget_item i ON i.id = l.item_id
+         LEFT JOIN product_product pp ON pp.id = l.product_id
+         LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+         LEFT JOIN uom_uom u ON u.id = l.uom_id
+         LEFT JOIN budget_consumption c ON c.item_id = l.item_id AND c.product_id = l.product_id
+             WHERE i.budget_id = %(budget_id)s AND l.id > %(last_id)s
+          ORDER BY l.id
+             LIMIT %(limit)s
+        """, budget_id=self.id, last_id=last_id, limit=EXPORT_PAGE_SIZE, lang=lang))
+
+    def _export_memo_lines(self):
+        lang = self.env.lang or 'en_US'
+        return self._export_pages(lambda last_id: SQL("""
+            SELECT ml.id, m.name, m.date, po.name, i.code,
+                   COALESCE(pp.default_code, pt.name->>%(lang)s, pt.name->>'en_US'),
+                   ml.budget_qty, ml.request_qty, ml.budget_price, ml.request_price, ml.over_amount
+              FROM memo_over_budget_line ml
+              JOIN memo_over_budget m ON m.id = ml.memo_id
+              JOIN purchase_order po ON po.id = m.purchase_order_id
+              JOIN budget_item i ON i.id = ml.budget_item_id
+         LEFT JOIN product_product pp ON pp.id = ml.product_id
+         LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+             WHERE i.budget_id = %(budget_id)s AND ml.id > %(last_id)s
+          ORDER BY ml.id
+             LIMIT %(limit)s
+        """, budget_id=self.id, last_id=last_id, limit=EXPORT_PAGE_SIZE, lang=lang))
+
+    def _export_sections(self):
+        return [
+            ('Items', ITEM_EXPORT_COLUMNS, self._export_items()),
+            ('Lines', LINE_EXPORT_COLUMNS, self._export_lines()),
+            ('Memo Revisions', MEMO_EXPORT_COLUMNS, self._export_memo_lines()),
+        ]
+
+    def _export_to_file(self, fp, file_format='csv'):
+        self.ensure_one()
+        # nilai stored harus sudah tertulis sebelum dibaca lewat SQL
+        self.env.flush_all()
+        if file_format == 'xlsx':
+            # constant_memory: baris ditulis langsung ke file sementara per sheet
+            workbook = xlsxwriter.Workbook(fp, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+            for title, columns, rows in self._export_sections():
+                sheet = workbook.add_worksheet(title)
+                sheet.write_row(0, 0, columns)
+                for row_number, row in enumerate(rows, start=1):
+                    sheet.write_row(row_number, 0, row)
+            workbook.close()
+            return
+
+        # csv: satu file, kolom pertama menandai jenis record
+        stream = io.TextIOWrapper(fp, encoding='utf-8', newline='')
+        writer = csv.writer(stream)
+        for title, columns, rows in self._export_sections():
+            writer.writerow(['record'] + columns)
+            for row in rows:
+                writer.writerow([title] + list(row))
+        stream.flush()
+        stream.detach()
+
+    def _action_export(self, file_format):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/pd_budget/export/{self.id}?file_format={file_format}',
+            'target': 'self',
+        }
+
+    def action_export_csv(self):
+        return self._action_export('csv')
+
+    def action_export_xlsx(self):
+        return self._action_export('xlsx')
@@ -0,0 +1,243 @@
+import csv
+import io
+import logging
+from itertools import islice
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = ['parent', 'item', 'type', 'product', 'description', 'uom', 'qty_plan', 'unit_price', 'remark']
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 500
+
+
+class BudgetImport(models.TransientModel):
+    _name = 'budget.import'
+    _description = 'Budget Line Import'
+
+    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade")
+    file = fields.Binary(string="File", required=True, attachment=True)
+    filename = fields.Char(string="Filename")
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    row_count = fields.Integer(string="Rows Read", readonly=True)
+    item_count = fields.Integer(string="Items Created", readonly=True)
+    line_count = fields.Integer(string="Lines Created", readonly=True)
+    error_count = fields.Integer(string="Rows Skipped", readonly=True)
+    error_log = fields.Text(string="Errors", readonly=True)
+
+    def _open_file(self):
+        # baca langsung dari filestore agar file tidak di-decode utuh ke memory
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError("File import belum diisi.")
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw)
+
+    def _iter_rows(self, fp):
+        if (self.filename or '').lower().endswith('.xlsx'):
+            if openpyxl is None:
+                raise UserError("Library openpyxl belum terpasang, gunakan file CSV.")
+            workbook = openpyxl.load_workbook(fp, read_only=True, data_only=True)
+            rows = workbook.active.iter_rows(values_only=True)
+        else:
+            rows = csv.reader(io.TextIOWrapper(fp, encoding='utf-8-sig', newline=''))
+
+        header = next(rows, None)
+        if not header:
+            raise UserError("File import kosong.")
+        header = [str(col or '').strip().lower() for col in header]
+        missing = {'parent', 'item', 'qty_plan'} - set(header)
+        if missing:
+            raise UserError(f"Kolom wajib tidak ditemukan: {', '.join(sorted(missing))}")
+
+        for row_number, row in enumerate(rows, start=2):
+            values = {
+                col: str(value).strip() if value is not None else ''
+                for col, value in zip(header, row)
+                if col in IMPORT_COLUMNS
+            }
+            if any(values.values()):
+                yield row_number, values
+
+    def _build_lookups(self):
+        items = self.env['budget.item'].search_fetch(
+            [('budget_id', '=', self.budget_id.id)], ['name', 'code', 'parent_id', 'type'],
+        )
+        parents = {}
+        children = {}
+        for item in items:
+            if item.parent_id:
+                children[item.parent_id.id, item.name.lower()] = item.id
+            else:
+                parents[item.name.lower()] = item.id
+                if item.code:
+                    parents[item.code.lower()] = item.id
+        uoms = {}
+        for uom in self.env['uom.uom'].search_fetch([], ['name']):
+            uoms.setdefault(uom.name.lower(), uom.id)
+        return {
+            'parents': parents,
+            'parent_types': {item.id: item.type for item in items if not item.parent_id},
+            'children': children,
+            'uoms': uoms,
+            'products': {},
+        }
+
+    def _resolve_products(self, keys, lookups):
+        # product dicari per chunk hanya untuk key yang belum dikenal
+        cache = lookups['products']
+        missing = {key for key in keys if key.lower() not in cache}
+        if not missing:
+            return
+        for key in missing:
+            cache[key.lower()] = None
+        products = self.env['product.product'].search_fetch(
+            ['|', ('default_code', 'in', list(missing)), ('name', 'in', list(missing))],
+            ['default_code', 'name', 'display_name', 'uom_id'],
+        )
+        for product in products:
+            data = (product.id, product.display_name, product.uom_id.id)
+            for key in (product.default_code, product.name):
+                if key and key.lower() in cache and cache[key.lower()] is None:
+                    cache[key.lower()] = data
+
+    def _process_chunk(self, rows, lookups, errors):
+        Item = self.env['budget.item']
+        budget_id = self.budget_id.id
+        self._resolve_products({values['product'] for _row, values in rows if values.get('product')}, lookups)
+
+        parsed = []
+        for row_number, values in rows:
+            try:
+                qty_plan = float(values.get('qty_plan') or 0)
+                unit_price = float(values['unit_price']) if values.get('unit_price') else None
+            except ValueError:
+                errors.append(f"Baris {row_number}: qty_plan/unit_price bukan angka.")
+                continue
+            if not values.get('item'):
+                errors.append(f"Baris {row_number}: kolom item kosong.")
+                continue
+            if not values.get('parent'):
+                errors.append(f"Baris {row_number}: kolom parent kosong.")
+                continue
+            product = None
+            if values.get('product'):
+                product = lookups['products'].get(values['product'].lower())
+                if not product:
+                    errors.append(f"Baris {row_number}: product '{values['product']}' tidak ditemukan.")
+                    continue
+            uom_id = product[2] if product else False
+            if values.get('uom'):
+                uom_id = lookups['uoms'].get(values['uom'].lower())
+                if not uom_id:
+                    errors.append(f"Baris {row_number}: satuan '{values['uom']}' tidak ditemukan.")
+                    continue
+            parent_key = values['parent'].lower()
+            if parent_key not in lookups['parents'] and not values.get('type'):
+                errors.append(f"Baris {row_number}: parent baru '{values['parent']}' membutuhkan kolom type.")
+                continue
+            parsed.append((values, product, uom_id, qty_plan, unit_price))
+
+        # parent dan child yang belum ada dibuat sekaligus per chunk
+        new_parents = {}
+        for values, *_rest in parsed:
+            parent_key = values['parent'].lower()
+            if parent_key not in lookups['parents'] and parent_key not in new_parents:
+                new_parents[parent_key] = {
+                    'budget_id': budget_id,
+                    'name': values['parent'],
+                    'type': values['type'],
+                }
+        if new_parents:
+            created = Item.create(list(new_parents.values()))
+            for key, item in zip(new_parents, created):
+                lookups['parents'][key] = item.id
+                lookups['parent_types'][item.id] = item.type
+
+        new_children = {}
+        for values, *_rest in parsed:
+            parent_id = lookups['parents'][values['parent'].lower()]
+            child_key = (parent_id, values['item'].lower())
+            if child_key not in lookups['children'] and child_key not in new_children:
+                new_children[child_key] = {
+                    'budget_id': budget_id,
+                    'parent_id': parent_id,
+                    'name': values['item'],
+                    'type': values.get('type') or lookups['parent_types'][parent_id],
+                }
+        if new_children:
+            created = Item.create(list(new_children.values()))
+            for key, item in zip(new_children, created):
+                lookups['children'][key] = item.id
+
+        line_vals = []
+        for values, product, uom_id, qty_plan, unit_price in parsed:
+            parent_id = lookups['parents'][values['parent'].lower()]
+            vals = {
+                'item_id': lookups['children'][parent_id, values['item'].lower()],
+                'product_id': product[0] if product else False,
+                'name': values.get('description') or (product[1] if product else False),
+                'uom_id': uom_id,
+                'qty_plan': qty_plan,
+                'remark': values.get('remark') or False,
+            }
+            if unit_price is not None or not product:
+                vals['unit_price'] = unit_price or 0.0
+            line_vals.append(vals)
+        self.env['budget.item.line'].create(line_vals)
+        return len(new_parents) + len(new_children), len(line_vals)
+
+    def action_import(self):
+        self.ensure_one()
+        lookups = self._build_lookups()
+        errors = []
+        row_count = item_count = line_count = error_count = 0
+        with self._open_file() as fp:
+            rows = self._iter_rows(fp)
+            while True:
+                chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                known_errors = len(errors)
+                items, lines = self._process_chunk(chunk, lookups, errors)
+                error_count += len(errors) - known_errors
+                del errors[IMPORT_MAX_ERRORS:]
+                row_count += len(chunk)
+                item_count += items
+                line_count += lines
+                # simpan per chunk lalu kosongkan cache ORM agar memory tetap kecil
+                self.env.flush_all()
+                self.env.invalidate_all()
+                _logger.info(
+                    "Import budget %s: %d baris dibaca, %d line dibuat, %d error",
+                    self.budget_id.budget_number, row_count, line_count, error_count,
+                )
+
+        self.write({
+            'state': 'done',
+            'row_count': row_count,
+            'item_count': item_count,
+            'line_count': line_count,
+            'error_count': error_count,
+            'error_log': '\n'.join(errors) or False,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Import Budget Lines',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
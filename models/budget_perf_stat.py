@@ -0,0 +1,155 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import Counter
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# statistik dikumpulkan per worker di memory lalu ditulis berkala dengan cursor terpisah,
+# supaya transaksi bisnis tidak berebut baris budget_perf_stat yang sama
+STAT_FLUSH_INTERVAL = 60
+_stat_lock = threading.Lock()
+_stat_buffer = {}
+_stat_last_flush = {}
+
+
+def _record_count(self, args, result):
+    # method @api.model memakai jumlah key / baris yang diproses, bukan len(self)
+    if self:
+        return len(self)
+    if args and hasattr(args[0], '__len__') and not isinstance(args[0], str):
+        return len(args[0])
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return 0
+
+
+def instrument(func):
+    # aktif jika system parameter budget.perf_instrumentation diisi;
+    # budget.perf_profile_threshold_ms > 0 menambahkan dump cProfile ke log
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        params = self.env['ir.config_parameter'].sudo()
+        if not params.get_param('budget.perf_instrumentation'):
+            return func(self, *args, **kwargs)
+
+        threshold = float(params.get_param('budget.perf_profile_threshold_ms') or 0)
+        profiler = cProfile.Profile() if threshold else None
+        cr = self.env.cr
+        query_start = cr.sql_log_count
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(self, *args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+
+        duration = (time.perf_counter() - start) * 1000
+        query_count = cr.sql_log_count - query_start
+        records = _record_count(self, args, result)
+        _logger.info("budget.perf %s", json.dumps({
+            'name': name,
+            'duration_ms': round(duration, 3),
+            'queries': query_count,
+            'records': records,
+        }))
+        self.env['budget.perf.stat']._record(name, duration, query_count, records)
+        if profiler and duration >= threshold:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+            _logger.info("budget.perf profile %s (%.1f ms)\n%s", name, duration, stream.getvalue())
+        return result
+
+    return wrapper
+
+
+class BudgetPerfStat(models.Model):
+    _name = 'budget.perf.stat'
+    _description = 'Budget Performance Statistic'
+    _order = 'total_ms desc'
+
+    name = fields.Char(string="Method", required=True, readonly=True)
+    call_count = fields.Integer(string="Calls", readonly=True)
+    total_ms = fields.Float(string="Total (ms)", readonly=True)
+    max_ms = fields.Float(string="Max (ms)", readonly=True)
+    avg_ms = fields.Float(string="Average (ms)", compute="_compute_averages")
+    query_count = fields.Integer(string="Queries", readonly=True)
+    avg_queries = fields.Float(string="Queries / Call", compute="_compute_averages")
+    record_count = fields.Integer(string="Records", readonly=True)
+    last_call = fields.Datetime(string="Last Call", readonly=True)
+
+    _sql_constraints = [
+        ('name_uniq', 'unique(name)', 'Statistik untuk method ini sudah ada.'),
+    ]
+
+    @api.depends('call_count', 'total_ms', 'query_count')
+    def _compute_averages(self):
+        for stat in self:
+            stat.avg_ms = stat.total_ms / stat.call_count if stat.call_count else 0.0
+            stat.avg_queries = stat.query_count / stat.call_count if stat.call_count else 0.0
+
+    @api.model
+    def _record(self, name, duration, query_count, record_count):
+        dbname = self.env.cr.dbname
+        with _stat_lock:
+            stat = _stat_buffer.setdefault((dbname, name), Counter())
+            stat['call_count'] += 1
+            stat['total_ms'] += duration
+            stat['max_ms'] = max(stat['max_ms'], duration)
+            stat['query_count'] += query_count
+            stat['record_count'] += record_count
+            due = time.monotonic() - _stat_last_flush.setdefault(dbname, time.monotonic()) >= STAT_FLUSH_INTERVAL
+        if due:
+            self._flush_buffer()
+
+    @api.model
+    def _flush_buffer(self):
+        # ditulis dengan cursor sendiri; jika gagal (mis. serialization error) data tetap di buffer
+        dbname = self.env.cr.dbname
+        with _stat_lock:
+            pending = {name: stat for (db, name), stat in _stat_buffer.items() if db == dbname}
+            for name in pending:
+                del _stat_buffer[dbname, name]
+            _stat_last_flush[dbname] = time.monotonic()
+        if not pending:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                for name, stat in sorted(pending.items()):
+                    cr.execute(SQL("""
+                        INSERT INTO budget_perf_stat (name, call_count, total_ms, max_ms, query_count, record_count,
+                                                      last_call, create_uid, write_uid, create_date, write_date)
+                        VALUES (%(name)s, %(calls)s, %(total)s, %(max)s, %(queries)s, %(records)s,
+                                (now() at time zone 'UTC'), %(uid)s, %(uid)s,
+                                (now() at time zone 'UTC'), (now() at time zone 'UTC'))
+                        ON CONFLICT (name) DO UPDATE
+                           SET call_count = budget_perf_stat.call_count + EXCLUDED.call_count,
+                               total_ms = budget_perf_stat.total_ms + EXCLUDED.total_ms,
+                               max_ms = GREATEST(budget_perf_stat.max_ms, EXCLUDED.max_ms),
+                               query_count = budget_perf_stat.query_count + EXCLUDED.query_count,
+                               record_count = budget_perf_stat.record_count + EXCLUDED.record_count,
+                               last_call = EXCLUDED.last_call,
+                               write_uid = EXCLUDED.write_uid,
+                               write_date = EXCLUDED.write_date
+                    """, name=name, calls=stat['call_count'], total=stat['total_ms'], max=stat['max_ms'],
+                        queries=stat['query_count'], records=stat['record_count'], uid=self.env.uid))
+        except Exception:
+            _logger.warning("budget.perf: gagal menulis statistik, dicoba lagi pada flush berikutnya", exc_info=True)
+            with _stat_lock:
+                for name, stat in pending.items():
+                    buffered = _stat_buffer.setdefault((dbname, name), Counter())
+                    max_ms = max(buffered['max_ms'], stat['max_ms'])
+                    buffered.update(stat)
+                    buffered['max_ms'] = max_ms
@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from odoo import models, fields, api
+
+from .budget_perf_stat import instrument
+
+class BudgetRecomputeQueue(models.Model):
+    _name = 'budget.recompute.queue'
+    _description = 'Budget Recompute Queue'
+    _order = 'id'
+
+    budget_item_id = fields.Many2one('budget.item', string="Budget Item", required=True, ondelete="cascade", index=True)
+    product_id = fields.Many2one('product.product', string="Product", required=True, ondelete="cascade")
+    mode = fields.Selection([
+        ('refresh', 'Refresh Consumption'),
+        ('sync', 'Re-plan (PO Line Write)'),
+        ('grow', 'Re-plan (PO Confirm)'),
+        ('release', 'Re-plan (PO Delete)'),
+    ], string="Mode", required=True, default='refresh')
+
+    @api.model
+    def _is_deferred(self):
+        return bool(self.env['ir.config_parameter'].sudo().get_param('budget.deferred_recompute'))
+
+    @api.model
+    def _schedule(self, keys, mode='refresh'):
+        # mode 'refresh' memperbarui ledger, mode lain menjalankan re-plan budget line.
+        # re-plan selalu dicatat append-only di queue lalu dilipat cron, agar confirm PO yang
+        # bersamaan tidak saling menunggu lock baris budget.item.line (kecuali Strict Enforcement)
+        if not keys:
+            return
+        keys = set(keys)
+        deferred = set()
+        if mode != 'refresh' or self._is_deferred():
+            items = self.env['budget.item'].sudo().browse({item_id for item_id, _product_id in keys})
+            strict_item_ids = set(items.filtered(lambda i: i.budget_id.force_sync_recompute).ids)
+            deferred = {key for key in keys if key[0] not in strict_item_ids}
+
+        sync_keys = keys - deferred
+        if sync_keys:
+            if mode == 'refresh':
+                self.env['budget.consumption']._refresh(sync_keys)
+            else:
+                self.env['purchase.order.line']._resync_budget_plan(sync_keys, mode)
+        if deferred:
+            self.sudo().create([
+                {'budget_item_id': item_id, 'product_id': product_id, 'mode': mode}
+                for item_id, product_id in sorted(deferred)
+            ])
+
+    @api.model
+    def _process(self, entries):
+        # satu refresh ledger untuk semua key, lalu re-plan per key sesuai urutan entry:
+        # mode tidak komutatif (release lalu grow != grow saja), hanya duplikat berurutan yang digabung
+        keys = set()
+        modes = defaultdict(list)
+        for entry in entries:
+            key = (entry.budget_item_id.id, entry.product_id.id)
+            keys.add(key)
+            if entry.mode != 'refresh' and modes[key][-1:] != [entry.mode]:
+                modes[key].append(entry.mode)
+
+        self.env['budget.consumption']._refresh(keys)
+        # putaran ke-n menjalankan mode ke-n tiap key, dikelompokkan per mode agar tetap batch
+        for step in range(max(map(len, modes.values()), default=0)):
+            keys_by_mode = defaultdict(set)
+            for key, key_modes in modes.items():
+                if step < len(key_modes):
+                    keys_by_mode[key_modes[step]].add(key)
+            for mode, mode_keys in keys_by_mode.items():
+                self.env['purchase.order.line']._resync_budget_plan(mode_keys, mode)
+
+    @api.model
+    @instrument
+    def _cron_process_queue(self, batch_size=5000):
+        processed = 0
+        while True:
+            entries = self.sudo().search([], limit=batch_size)
+            if not entries:
+                break
+            self._process(entries)
+            processed += len(entries)
+            entries.unlink()
+        return processed
@@ -0,0 +1,92 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+class BudgetReport(models.Model):
+    _name = 'budget.report'
+    _description = 'Budget Analysis'
+    _auto = False
+    _rec_name = 'item_id'
+    _order = 'budget_id, item_id'
+
+    budget_id = fields.Many2one('budget.budget', string="Budget", readonly=True)
+    budget_type = fields.Char(string="Budget Type", readonly=True)
+    item_id = fields.Many2one('budget.item', string="Budget Item", readonly=True)
+    parent_item_id = fields.Many2one('budget.item', string="Parent Item", readonly=True)
+    product_id = fields.Many2one('product.product', string="Product", readonly=True)
+    start_periode = fields.Date(string="Start Periode", readonly=True)
+    end_periode = fields.Date(string="End Periode", readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Currency", readonly=True)
+    qty_plan = fields.Float(string="Qty Plan", readonly=True)
+    qty_used = fields.Float(string="Qty Used", readonly=True)
+    budget_plan = fields.Float(string="Budget Plan", readonly=True)
+    request = fields.Float(string="Request", digits=(16, 2), readonly=True)
+    actual = fields.Float(string="Actual", digits=(16, 2), readonly=True)
+    remaining = fields.Float(string="Remaining", readonly=True)
+    over_budget = fields.Float(string="Over Budget", readonly=True)
+
+    def _query(self):
+        # plan dari budget.item.line, konsumsi dari ledger budget.consumption
+        # (sudah berisi state PO dan payment state invoice)
+        return SQL("""
+            WITH plan AS (
+                SELECT item_id, product_id,
+                       SUM(qty_plan) AS qty_plan,
+                       SUM(subtotal) AS budget_plan
+                  FROM budget_item_line
+              GROUP BY item_id, product_id
+            )
+            -- id stabil dari pasangan (item, product) supaya link tetap benar setelah refresh;
+            -- 24 bit untuk product, hasilnya tetap di bawah batas integer aman JavaScript (2^53)
+            SELECT (item.id::bigint << 24) | COALESCE(plan.product_id, cons.product_id, 0) AS id,
+                   item.budget_id,
+                   budget.budget_type,
+                   item.id AS item_id,
+                   COALESCE(item.parent_id, item.id) AS parent_item_id,
+                   COALESCE(plan.product_id, cons.product_id) AS product_id,
+                   budget.start_periode,
+                   budget.end_periode,
+                   budget.currency_id,
+                   COALESCE(plan.qty_plan, 0) AS qty_plan,
+                   COALESCE(cons.committed_qty, 0) AS qty_used,
+                   COALESCE(plan.budget_plan, 0) AS budget_plan,
+                   COALESCE(cons.committed_amount, 0) AS request,
+                   COALESCE(cons.paid_amount, 0) AS actual,
+                   COALESCE(plan.budget_plan, 0) - COALESCE(cons.committed_amount, 0) AS remaining,
+                   GREATEST(COALESCE(cons.paid_amount, 0) - COALESCE(plan.budget_plan, 0), 0) AS over_budget
+              FROM plan
+         FULL JOIN budget_consumption cons
+                ON cons.item_id = plan.item_id AND cons.product_id = plan.product_id
+              JOIN budget_item item ON item.id = COALESCE(plan.item_id, cons.item_id)
+              JOIN budget_budget budget ON budget.id = item.budget_id
+        """)
+
+    def init(self):
+        self.env.cr.execute(SQL("DROP MATERIALIZED VIEW IF EXISTS %s", SQL.identifier(self._table)))
+        self.env.cr.execute(SQL(
+            "CREATE MATERIALIZED VIEW %s AS (%s)", SQL.identifier(self._table), self._query(),
+        ))
+        # unique index dibutuhkan untuk REFRESH ... CONCURRENTLY
+        self.env.cr.execute(SQL(
+            "CREATE UNIQUE INDEX %s ON %s (id)",
+            SQL.identifier(f'{self._table}_id_uniq'), SQL.identifier(self._table),
+        ))
+        for column in ('budget_id', 'item_id', 'product_id'):
+            self.env.cr.execute(SQL(
+                "CREATE INDEX %s ON %s (%s)",
+                SQL.identifier(f'{self._table}_{column}_index'), SQL.identifier(self._table),
+                SQL.identifier(column),
+            ))
+
+    @api.model
+    def action_refresh(self):
+        self.env['budget.consumption'].flush_model()
+        self.env['budget.item.line'].flush_model()
+        self.env.cr.execute(SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", SQL.identifier(self._table)))
+        self.env.invalidate_all()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Budget Analysis',
+            'res_model': 'budget.report',
+            'view_mode': 'pivot,graph,list',
+            'target': 'current',
+        }
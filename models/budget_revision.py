@@ -0,0 +1,188 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+from .budget import reserve_code_numbers
+
+# kolom budget.item.line yang di-snapshot; nilai revisi 0 = initial_<kolom>
+REVISION_COLUMNS = ('qty_plan', 'unit_price')
+
+
+class BudgetRevision(models.Model):
+    _name = 'budget.revision'
+    _description = 'Budget Revision'
+    _order = 'budget_id, sequence desc'
+
+    name = fields.Char(string="Name", compute="_compute_name", store=True)
+    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade", index=True)
+    sequence = fields.Integer(string="Revision", required=True, readonly=True)
+    date = fields.Datetime(string="Date", default=fields.Datetime.now, readonly=True)
+    memo_ids = fields.Many2many('memo.over.budget', string="Memo Over Budget", readonly=True)
+    delta_ids = fields.One2many('budget.revision.delta', 'revision_id', string="Changes")
+    delta_count = fields.Integer(string="Changed Lines", readonly=True)
+
+    _sql_constraints = [
+        ('budget_sequence_uniq', 'unique(budget_id, sequence)', 'Nomor revisi harus unik per budget.'),
+    ]
+
+    @api.depends('budget_id.budget_number', 'sequence')
+    def _compute_name(self):
+        for rev in self:
+            rev.name = f"{rev.budget_id.budget_number} Rev.{rev.sequence}"
+
+    def _seed_revision_counter(self, budgets):
+        last = dict(self._read_group([('budget_id', 'in', budgets.ids)], ['budget_id'], ['sequence:max']))
+        return {budget.id: last.get(budget) or 0 for budget in budgets}
+
+    @api.model
+    def _snapshot(self, budgets, memos):
+        # satu revisi per budget; hanya kolom yang berubah dari nilai revisi sebelumnya yang disimpan
+        if not budgets:
+            return self
+        self.env['budget.item.line'].flush_model(
+            ['item_id', *REVISION_COLUMNS, *(f'initial_{col}' for col in REVISION_COLUMNS)]
+        )
+        self.env['budget.item'].flush_model(['budget_id'])
+        last_nums = reserve_code_numbers(
+            budgets, 'revision_counter', dict.fromkeys(budgets.ids, 1), self._seed_revision_counter, 1,
+        )
+        revisions = self.sudo().create([{
+            'budget_id': budget.id,
+            'sequence': last_nums[budget.id] + 1,
+            'memo_ids': [(6, 0, memos.filtered(
+                lambda m: budget in m.line_ids.budget_item_id.budget_id
+            ).ids)],
+        } for budget in budgets])
+
+        cr = self.env.cr
+        for rev in revisions:
+            cr.execute(SQL("""
+                INSERT INTO budget_revision_delta
+                       (revision_id, budget_id, sequence, line_id, qty_plan, unit_price,
+                        create_uid, create_date, write_uid, write_date)
+                SELECT %(rev)s, %(budget)s, %(seq)s, l.id,
+                       CASE WHEN l.qty_plan IS DISTINCT FROM COALESCE(q.qty_plan, l.initial_qty_plan)
+                            THEN l.qty_plan END,
+                       CASE WHEN l.unit_price IS DISTINCT FROM COALESCE(p.unit_price, l.initial_unit_price)
+                            THEN l.unit_price END,
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM budget_item_line l
+                  JOIN budget_item i ON i.id = l.item_id
+             LEFT JOIN LATERAL (
+                        SELECT d.qty_plan FROM budget_revision_delta d
+                         WHERE d.line_id = l.id AND d.qty_plan IS NOT NULL
+                      ORDER BY d.sequence DESC LIMIT 1
+                       ) q ON TRUE
+             LEFT JOIN LATERAL (
+                        SELECT d.unit_price FROM budget_revision_delta d
+                         WHERE d.line_id = l.id AND d.unit_price IS NOT NULL
+                      ORDER BY d.sequence DESC LIMIT 1
+                       ) p ON TRUE
+                 WHERE i.budget_id = %(budget)s
+                   AND (l.qty_plan IS DISTINCT FROM COALESCE(q.qty_plan, l.initial_qty_plan)
+                        OR l.unit_price IS DISTINCT FROM COALESCE(p.unit_price, l.initial_unit_price))
+            """, rev=rev.id, budget=rev.budget_id.id, seq=rev.sequence, uid=self.env.uid))
+            rev.delta_count = cr.rowcount
+        self.env['budget.revision.delta'].invalidate_model()
+        revisions.invalidate_recordset(['delta_ids'])
+        return revisions
+
+
+class BudgetRevisionDelta(models.Model):
+    _name = 'budget.revision.delta'
+    _description = 'Budget Revision Delta'
+    _order = 'sequence desc, line_id'
+
+    # append-only; kolom kosong (NULL) berarti nilai tidak berubah di revisi ini
+    revision_id = fields.Many2one('budget.revision', string="Revision", required=True, ondelete="cascade", index=True)
+    budget_id = fields.Many2one('budget.budget', string="Budget", required=True, ondelete="cascade")
+    sequence = fields.Integer(string="Revision No.", required=True)
+    line_id = fields.Many2one('budget.item.line', string="Budget Line", required=True, ondelete="cascade")
+    qty_plan = fields.Float(string="Qty Plan")
+    unit_price = fields.Float(string="Unit Price")
+
+    def init(self):
+        # lookup "as-of" per kolom: index scan (line_id, sequence) -> O(log n)
+        for column in REVISION_COLUMNS:
+            create_index(
+                self.env.cr, f'budget_revision_delta_line_{column}_index', self._table,
+                ['line_id', 'sequence'], where=f'{column} IS NOT NULL',
+            )
+        create_index(self.env.cr, 'budget_revision_delta_budget_sequence_index', self._table, ['budget_id', 'sequence'])
+
+
+class Budget(models.Model):
+    _inherit = 'budget.budget'
+
+    revision_counter = fields.Integer(string="Last Revision", readonly=True, copy=False)
+    revision_ids = fields.One2many('budget.revision', 'budget_id', string="Revisions")
+
+    def _revision_values(self, sequence, line_ids=None):
+        # nilai plan per line pada revisi `sequence` (0 = initial plan)
+        self.ensure_one()
+        if line_ids is not None and not line_ids:
+            return {}
+        cr = self.env.cr
+        line_filter = SQL("AND l.id IN %s", tuple(line_ids)) if line_ids is not None else SQL()
+        cr.execute(SQL("""
+            SELECT l.id,
+                   COALESCE(q.qty_plan, l.initial_qty_plan),
+                   COALESCE(p.unit_price, l.initial_unit_price)
+              FROM budget_item_line l
+              JOIN budget_item i ON i.id = l.item_id
+         LEFT JOIN LATERAL (
+                    SELECT d.qty_plan FROM budget_revision_delta d
+                     WHERE d.line_id = l.id AND d.qty_plan IS NOT NULL AND d.sequence <= %(seq)s
+                  ORDER BY d.sequence DESC LIMIT 1
+                   ) q ON TRUE
+         LEFT JOIN LATERAL (
+                    SELECT d.unit_price FROM budget_revision_delta d
+                     WHERE d.line_id = l.id AND d.unit_price IS NOT NULL AND d.sequence <= %(seq)s
+                  ORDER BY d.sequence DESC LIMIT 1
+                   ) p ON TRUE
+             WHERE i.budget_id = %(budget)s %(line_filter)s
+        """, seq=sequence, budget=self.id, line_filter=line_filter))
+        return {line_id: {'qty_plan': qty, 'unit_price': price} for line_id, qty, price in cr.fetchall()}
+
+    def get_revision_values(self, sequence):
+        self.ensure_one()
+        self.env['budget.revision.delta'].flush_model()
+        return self._revision_values(sequence)
+
+    def get_revision_diff(self, sequence_from, sequence_to):
+        # hanya line yang punya delta di antara dua revisi yang dibandingkan
+        self.ensure_one()
+        low, high = sorted((sequence_from, sequence_to))
+        self.env['budget.revision.delta'].flush_model()
+        self.env.cr.execute(SQL("""
+            SELECT DISTINCT line_id FROM budget_revision_delta
+             WHERE budget_id = %s AND sequence > %s AND sequence <= %s
+        """, self.id, low, high))
+        line_ids = [row[0] for row in self.env.cr.fetchall()]
+        before = self._revision_values(sequence_from, line_ids)
+        after = self._revision_values(sequence_to, line_ids)
+        lines = self.env['budget.item.line'].browse(sorted(after))
+        diff = []
+        for line in lines:
+            old, new = before[line.id], after[line.id]
+            if old == new:
+                continue
+            diff.append({
+                'line_id': line.id,
+                'item': line.item_id.display_name,
+                'product': line.product_id.display_name,
+                **{f'{col}_from': old[col] for col in REVISION_COLUMNS},
+                **{f'{col}_to': new[col] for col in REVISION_COLUMNS},
+            })
+        return diff
+
+    def action_view_revisions(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Budget Revisions',
+            'res_model': 'budget.revision',
+            'view_mode': 'list,form',
+            'domain': [('budget_id', '=', self.id)],
+            'target': 'current',
+        }
@@ -0,0 +1,172 @@
+from odoo import models, fields
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+
+def remap_code(column, prefix):
+    # "0001/RAB-FO-0100" -> "<prefix baru>/RAB-FO-0100"
+    return SQL(
+        "CASE WHEN strpos(%s, '/') > 0 THEN %s || substr(%s, strpos(%s, '/')) ELSE %s END",
+        column, prefix, column, column, column,
+    )
+
+
+class BudgetRollover(models.TransientModel):
+    _name = 'budget.rollover'
+    _description = 'Budget Rollover'
+
+    budget_id = fields.Many2one('budget.budget', string="Source Budget", required=True, ondelete="cascade")
+    date = fields.Date(string="Date", required=True, default=fields.Date.today)
+    start_periode = fields.Date(string="Start Periode", required=True)
+    end_periode = fields.Date(string="End Periode", required=True)
+    qty_mode = fields.Selection([
+        ('plan', 'Current Qty Plan'),
+        ('initial', 'Initial Qty Plan'),
+        ('remain', 'Qty Remain'),
+    ], string="Carry Qty From", default='plan', required=True)
+    price_increase = fields.Float(string="Unit Price Change (%)", help="Contoh: 5 untuk kenaikan harga 5%.")
+    skip_empty = fields.Boolean(string="Skip Zero Qty Lines", default=True)
+
+    def _new_budget_vals(self):
+        source = self.budget_id
+        return {
+            'date': self.date,
+            'budget_type': source.budget_type,
+            'start_periode': self.start_periode,
+            'end_periode': self.end_periode,
+            'company_id': source.company_id.id,
+            'currency_id': source.currency_id.id,
+            'notes': source.notes,
+            'template_id': source.template_id.id,
+            'template_update_mode': source.template_update_mode,
+            'force_sync_recompute': source.force_sync_recompute,
+            'item_code_counter': source.item_code_counter,
+        }
+
+    def _copy_items(self, budget):
+        # parent lalu child, kode diganti prefix budget baru; child dipetakan ke parent baru lewat kode
+        cr = self.env.cr
+        prefix = budget.budget_number.split('/')[0]
+        params = {'source': self.budget_id.id, 'budget': budget.id, 'uid': self.env.uid}
+
+        for level in ('parent', 'child'):
+            if level == 'parent':
+                source_join = SQL("")
+                parent_value = SQL("NULL")
+                level_filter = SQL("i.parent_id IS NULL")
+            else:
+                source_join = SQL("""
+                    JOIN budget_item op ON op.id = i.parent_id
+                    JOIN budget_item np ON np.budget_id = %s AND np.code = %s
+                """, budget.id, remap_code(SQL("op.code"), prefix))
+                parent_value = SQL("np.id")
+                level_filter = SQL("i.parent_id IS NOT NULL")
+            cr.execute(SQL("""
+                INSERT INTO budget_item
+                       (budget_id, parent_id, code, name, display_name, type, approved, check_detail,
+                        is_parent, child_code_counter, template_detail_id,
+                        budget_plan, request, remaining, over_budget, actual,
+                        create_uid, create_date, write_uid, write_date)
+                SELECT %(budget)s, %(parent_value)s, %(code)s, i.name,
+                       %(code)s || ' - ' || i.name, i.type, i.approved, i.check_detail,
+                       %(is_parent)s, i.child_code_counter, i.template_detail_id,
+                       0, 0, 0, 0, 0,
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM budget_item i
+                       %(source_join)s
+                 WHERE i.budget_id = %(source)s AND %(level_filter)s
+              ORDER BY i.id
+            """, parent_value=parent_value, code=remap_code(SQL("i.code"), prefix), is_parent=level == 'parent',
+                source_join=source_join, level_filter=level_filter, **params))
+
+        cr.execute(SQL("""
+            UPDATE budget_item SET parent_path = id || '/'
+             WHERE budget_id = %(budget)s AND parent_id IS NULL
+        """, **params))
+        cr.execute(SQL("""
+            UPDATE budget_item c SET parent_path = p.parent_path || c.id || '/'
+              FROM budget_item p
+             WHERE c.parent_id = p.id AND c.budget_id = %(budget)s
+        """, **params))
+
+    def _copy_lines(self, budget):
+        qty = {
+            'plan': SQL("l.qty_plan"),
+            'initial': SQL("l.initial_qty_plan"),
+            'remain': SQL("GREATEST(l.qty_remain, 0)"),
+        }[self.qty_mode]
+        price = SQL("l.unit_price")
+        if self.price_increase:
+            currency = budget.currency_id or budget.company_id.currency_id
+            price = SQL("ROUND((l.unit_price * %s)::numeric, %s)::float8",
+                        1 + self.price_increase / 100, currency.decimal_places)
+        empty_filter = SQL("AND %s > 0", qty) if self.skip_empty else SQL()
+        prefix = budget.budget_number.split('/')[0]
+        self.env.cr.execute(SQL("""
+            INSERT INTO budget_item_line
+                   (item_id, product_id, name, uom_id, qty_plan, initial_qty_plan,
+                    unit_price, initial_unit_price, qty_used, qty_remain, subtotal, remark,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT ni.id, l.product_id, l.name, l.uom_id, %(qty)s, %(qty)s,
+                   %(price)s, %(price)s, 0, %(qty)s, %(qty)s * %(price)s, l.remark,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM budget_item_line l
+              JOIN budget_item oi ON oi.id = l.item_id
+              JOIN budget_item ni ON ni.budget_id = %(budget)s AND ni.code = %(code)s
+             WHERE oi.budget_id = %(source)s %(empty_filter)s
+          ORDER BY l.id
+        """, qty=qty, price=price, empty_filter=empty_filter, code=remap_code(SQL("oi.code"), prefix),
+            budget=budget.id, source=self.budget_id.id, uid=self.env.uid))
+
+    def _compute_new_amounts(self, budget):
+        # budget baru belum punya konsumsi: request/actual 0, plan = subtotal line (dirollup via parent_path)
+        cr = self.env.cr
+        cr.execute(SQL("""
+            UPDATE budget_item i SET budget_plan = s.total, remaining = s.total
+              FROM (SELECT l.item_id, SUM(l.subtotal) AS total
+                      FROM budget_item_line l
+                      JOIN budget_item li ON li.id = l.item_id
+                     WHERE li.budget_id = %(budget)s
+                  GROUP BY l.item_id) s
+             WHERE i.id = s.item_id
+               AND NOT EXISTS (SELECT 1 FROM budget_item c WHERE c.parent_id = i.id)
+        """, budget=budget.id))
+        cr.execute(SQL("""
+            UPDATE budget_item p SET budget_plan = s.total, remaining = s.total
+              FROM (SELECT p2.id, SUM(leaf.budget_plan) AS total
+                      FROM budget_item p2
+                      JOIN budget_item leaf ON leaf.parent_path LIKE p2.parent_path || '%%'
+                                           AND leaf.id != p2.id
+                     WHERE p2.budget_id = %(budget)s
+                       AND NOT EXISTS (SELECT 1 FROM budget_item c WHERE c.parent_id = leaf.id)
+                  GROUP BY p2.id) s
+             WHERE p.id = s.id
+        """, budget=budget.id))
+
+    def action_rollover(self):
+        self.ensure_one()
+        if self.end_periode < self.start_periode:
+            raise UserError("End Periode harus setelah Start Periode.")
+
+        # item dari template tidak dibuat ulang, seluruh tree disalin dari budget sumber
+        budget = self.env['budget.budget'].with_context(budget_skip_template_items=True).create(
+            self._new_budget_vals()
+        )
+        self.env['budget.item'].flush_model()
+        self.env['budget.item.line'].flush_model()
+
+        self._copy_items(budget)
+        self._copy_lines(budget)
+        self._compute_new_amounts(budget)
+        self.env['budget.item'].invalidate_model()
+        self.env['budget.item.line'].invalidate_model()
+        budget.invalidate_recordset(['item_ids'])
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Budget',
+            'res_model': 'budget.budget',
+            'res_id': budget.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
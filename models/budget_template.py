@@ -1,5 +1,9 @@
+from collections import Counter
+
 from odoo import models, fields, api
 
+from .budget import check_child_capacity, reserve_code_numbers
+
 class BudgetTemplate(models.Model):
     _name = 'budget.template'
     _description = 'Budget'
@@ -14,6 +18,7 @@ class BudgetTemplate(models.Model):
     ], string="Type of Budget")
 
     detail_ids = fields.One2many('template.detail', 'template_id', string="Details")
+    detail_sequence_counter = fields.Integer(string="Last Detail Sequence", readonly=True, copy=False)
 
 class TemplateDetail(models.Model):
     _name = 'template.detail'
@@ -28,6 +33,11 @@ class TemplateDetail(models.Model):
     child_ids = fields.One2many('template.detail', 'parent_id', string="Children")
     check_detail = fields.Boolean('Check Detail', default=False)
     is_parent = fields.Boolean(compute="_compute_is_parent", store=True)
+    child_sequence_counter = fields.Integer(string="Last Child Sequence", readonly=True, copy=False)
+
+    _sql_constraints = [
+        ('template_sequence_uniq', 'unique(template_id, sequence)', 'Sequence template detail harus unik per template.'),
+    ]
 
     @api.depends('parent_id')
     def _compute_is_parent(self):
@@ -35,36 +45,66 @@ class TemplateDetail(models.Model):
             rec.is_parent = not bool(rec.parent_id)
 
     @api.model
-    def create(self, vals):
-        if vals.get('sequence', 'New') == 'New':
-            if not vals.get('parent_id'):
-                last_parent = self.search([
-                    ('parent_id', '=', False)
-                ], order='sequence desc', limit=1)
-
-                if last_parent and last_parent.sequence:
-                    try:
-                        last_num = int(last_parent.sequence.split('-')[-1])
-                    except ValueError:
-                        last_num = 0
-                    new_num = last_num + 100
-                else:
-                    new_num = 100
-
-                vals['sequence'] = f"{new_num:04d}"
+    def _sequence_number(self, sequence, default=0):
+        try:
+            return int(sequence.split('-')[-1])
+        except (AttributeError, ValueError):
+            return default
+
+    def _seed_parent_counter(self, templates):
+        last_sequences = dict(self._read_group(
+            [('template_id', 'in', templates.ids), ('parent_id', '=', False)],
+            ['template_id'], ['sequence:max'],
+        ))
+        return {
+            template.id: self._sequence_number(last_sequences[template]) if last_sequences.get(template) else 0
+            for template in templates
+        }
+
+    def _seed_child_counter(self, parents):
+        last_sequences = dict(self._read_group(
+            [('parent_id', 'in', parents.ids)], ['parent_id'], ['sequence:max'],
+        ))
+        seeds = {}
+        for parent in parents:
+            parent_num = self._sequence_number(parent.sequence)
+            if last_sequences.get(parent):
+                seeds[parent.id] = self._sequence_number(last_sequences[parent], parent_num)
             else:
-                parent = self.env['template.detail'].browse(vals['parent_id'])
-                last_child = self.search([('parent_id', '=', parent.id)], order='sequence desc', limit=1)
+                seeds[parent.id] = parent_num
+        return seeds
+
+    def _assign_sequences(self, vals_list):
+        # nomor diambil dari counter per template (parent) dan per parent (child)
+        parent_vals = [vals for vals in vals_list if not vals.get('parent_id') and vals.get('template_id')]
+        child_vals = [vals for vals in vals_list if vals.get('parent_id')]
 
-                if last_child and last_child.sequence:
-                    try:
-                        last_num = int(last_child.sequence.split('-')[-1])
-                    except ValueError:
-                        last_num = int(parent.sequence.split('-')[-1])
-                    new_num = last_num + 1
-                else:
-                    new_num = int(parent.sequence.split('-')[-1]) + 1
+        if parent_vals:
+            counts = Counter(vals['template_id'] for vals in parent_vals)
+            last_nums = reserve_code_numbers(
+                self.env['budget.template'].browse(list(counts)), 'detail_sequence_counter',
+                counts, self._seed_parent_counter, 100,
+            )
+            for vals in parent_vals:
+                last_nums[vals['template_id']] += 100
+                vals['sequence'] = f"{last_nums[vals['template_id']]:04d}"
 
-                vals['sequence'] = f"{new_num:04d}"
+        if child_vals:
+            counts = Counter(vals['parent_id'] for vals in child_vals)
+            last_nums = reserve_code_numbers(
+                self.browse(list(counts)), 'child_sequence_counter', counts, self._seed_child_counter, 1,
+            )
+            check_child_capacity(
+                self.browse(list(counts)), last_nums, counts,
+                lambda parent: self._sequence_number(parent.sequence), "Template detail",
+            )
+            for vals in child_vals:
+                last_nums[vals['parent_id']] += 1
+                vals['sequence'] = f"{last_nums[vals['parent_id']]:04d}"
 
-        return super().create(vals)
\ No newline at end of file
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_sequence = [vals for vals in vals_list if vals.get('sequence', 'New') == 'New']
+        if to_sequence:
+            self._assign_sequences(to_sequence)
+        return super().create(vals_list)
@@ -1,5 +1,10 @@
+from collections import defaultdict
+
 from odoo import models, fields, api
 
+from .budget import lock_rows
+from .budget_perf_stat import instrument
+
 class MemoOverBudget(models.Model):
     _name = 'memo.over.budget'
     _description = 'Memo Over Budget'
@@ -7,7 +12,7 @@ class MemoOverBudget(models.Model):
 
     name = fields.Char(string="Name", readonly=True, copy=False)
     purchase_order_id = fields.Many2one(
-        'purchase.order', string='Reference', required=True, ondelete='cascade')
+        'purchase.order', string='Reference', required=True, ondelete='cascade', index=True)
     date = fields.Date(string="Date", default=fields.Date.today)
     reason = fields.Text(string="Reason")
     need_confirm_memo = fields.Boolean(
@@ -19,27 +24,45 @@ class MemoOverBudget(models.Model):
 
     line_ids = fields.One2many('memo.over.budget.line', 'memo_id', string='Detail Over Budget')
 
-    @api.model
-    def create(self, vals):
-        if not vals.get('name') or vals.get('name') == 'New':
-            vals['name'] = self.env['ir.sequence'].next_by_code('memo.over.budget') or 'New'
-        return super(MemoOverBudget, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if not vals.get('name') or vals.get('name') == 'New':
+                vals['name'] = self.env['ir.sequence'].next_by_code('memo.over.budget') or 'New'
+        return super(MemoOverBudget, self).create(vals_list)
 
+    @instrument
     def action_confirm_memo(self):
-        for memo in self:
-            memo.purchase_order_id.memo_over_budget_done = True
+        self.purchase_order_id.memo_over_budget_done = True
+
+        # revisi qty_plan / unit_price dikumpulkan dulu, lalu satu write per budget line
+        memo_lines = self.line_ids.filtered(lambda l: l.budget_item_id and l.product_id)
+        budget_lines = self.env['budget.item.line'].search([
+            ('item_id', 'in', memo_lines.budget_item_id.ids),
+            ('product_id', 'in', memo_lines.product_id.ids),
+        ])
+        lock_rows(budget_lines)
+        budget_lines.invalidate_recordset(['qty_plan', 'unit_price'])
+        budget_lines_by_key = defaultdict(lambda: self.env['budget.item.line'])
+        for bl in budget_lines:
+            budget_lines_by_key[bl.item_id.id, bl.product_id.id] |= bl
+
+        revisions = {}
+        for line in memo_lines:
+            for bl in budget_lines_by_key[line.budget_item_id.id, line.product_id.id]:
+                vals = revisions.setdefault(bl, {})
+                if line.request_qty > vals.get('qty_plan', bl.qty_plan):
+                    vals['qty_plan'] = line.request_qty
+
+                if line.request_price > vals.get('unit_price', bl.unit_price):
+                    vals['unit_price'] = line.request_price
 
-            for line in memo.line_ids:
-                if line.budget_item_id and line.product_id:
-                    budget_lines = line.budget_item_id.line_ids.filtered(
-                        lambda l: l.product_id == line.product_id
-                    )
-                    for bl in budget_lines:
-                        if line.request_qty > bl.qty_plan:
-                            bl.qty_plan = line.request_qty
+        for bl in sorted(revisions, key=lambda bl: bl.id):
+            if revisions[bl]:
+                bl.write(revisions[bl])
 
-                        if line.request_price > bl.unit_price:
-                            bl.unit_price = line.request_price
+        # snapshot nilai plan setelah revisi memo (hanya delta per kolom)
+        self.env['budget.revision']._snapshot(memo_lines.budget_item_id.budget_id, self)
 
         return {'type': 'ir.actions.act_window_close'}
 
@@ -51,12 +74,13 @@ class MemoOverBudgetLine(models.Model):
     purchase_line_id = fields.Many2one(
         'purchase.order.line',
         string='Purchase Line',
-        ondelete='cascade'
+        ondelete='cascade',
+        index=True,
     )
-    memo_id = fields.Many2one('memo.over.budget', string='Memo', ondelete='cascade')
+    memo_id = fields.Many2one('memo.over.budget', string='Memo', ondelete='cascade', index=True)
     description = fields.Char(string="Deskripsi")
     product_id = fields.Many2one('product.product', string='Product', readonly=True)
-    budget_item_id = fields.Many2one('budget.item', string='Budget Item', readonly=True)
+    budget_item_id = fields.Many2one('budget.item', string='Budget Item', readonly=True, index=True)
     request_qty = fields.Float(string='Request Qty', readonly=True)
     budget_qty = fields.Float(string='Budget Qty', readonly=True)
     request_price = fields.Float(string='Request Price', readonly=True)
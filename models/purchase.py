@@ -1,5 +1,29 @@
+from collections import defaultdict, namedtuple
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.tools import float_compare
+from odoo.tools.sql import create_index
+
+from .budget import lock_rows
+from .budget_perf_stat import instrument
+
+PLAN_STATES = ('purchase', 'done')
+REQUEST_STATES = ('draft', 'sent', 'to approve', 'purchase')
+PLAN_PRECISION = 6
+
+# field purchase.order.line yang dibaca oleh budget / memo over budget, termasuk sumber price_subtotal
+# (discount, pajak include, satuan yang menghitung ulang price_unit)
+BUDGET_TRIGGER_FIELDS = {
+    'product_qty', 'price_unit', 'product_id', 'budget_item_id', 'order_id', 'state',
+    'discount', 'taxes_id', 'product_uom', 'price_subtotal',
+}
+
+# hasil evaluasi budget per PO line
+BudgetVerdict = namedtuple('BudgetVerdict', [
+    'has_budget', 'over_qty', 'over_price', 'posisi_over',
+    'qty_remain', 'max_price', 'budget_amount', 'need_memo',
+])
 
 class PurchaseOrderLine(models.Model):
     _inherit = 'purchase.order.line'
@@ -7,9 +31,41 @@ class PurchaseOrderLine(models.Model):
     budget_item_id = fields.Many2one(
         'budget.item',
         string="Budget Item",
-        domain="[('parent_id', '!=', False)]"
+        domain="[('parent_id', '!=', False)]",
+        index=True,
     )
     over_budget = fields.Boolean(string="Over Budget", compute="_compute_over_budget", store=True)
+    is_committed = fields.Boolean(string="Committed", compute="_compute_is_committed", store=True)
+    is_paid = fields.Boolean(string="Paid", compute="_compute_is_paid", store=True)
+
+    def init(self):
+        super().init()
+        create_index(
+            self.env.cr, 'purchase_order_line_budget_item_product_index', self._table,
+            ['budget_item_id', 'product_id'], where='budget_item_id IS NOT NULL',
+        )
+        create_index(
+            self.env.cr, 'purchase_order_line_budget_item_committed_index', self._table,
+            ['budget_item_id'], where='budget_item_id IS NOT NULL AND is_committed',
+        )
+        create_index(
+            self.env.cr, 'purchase_order_line_budget_item_paid_index', self._table,
+            ['budget_item_id'], where='budget_item_id IS NOT NULL AND is_paid',
+        )
+
+    @api.depends('order_id.state')
+    def _compute_is_committed(self):
+        for line in self:
+            line.is_committed = line.order_id.state in REQUEST_STATES
+
+    @api.depends('order_id.order_line.invoice_lines.move_id.payment_state')
+    def _compute_is_paid(self):
+        # satu invoice PO yang lunas menandai semua line PO tersebut
+        for line in self:
+            line.is_paid = any(
+                move.payment_state == 'paid'
+                for move in line.order_id.order_line.invoice_lines.move_id
+            )
 
     @api.constrains('product_id', 'budget_item_id')
     def _check_product_in_budget_item(self):
@@ -25,94 +81,201 @@ class PurchaseOrderLine(models.Model):
                     )
 
     @api.depends('product_qty', 'price_unit', 'budget_item_id')
+    @instrument
     def _compute_over_budget(self):
+        verdicts = self._evaluate_budget()
         for line in self:
-            over = False
-            if line.budget_item_id and line.product_id:
-                budget_lines = line.budget_item_id.line_ids.filtered(
-                    lambda l: l.product_id == line.product_id
-                )
-                if budget_lines:
-                    total_remain = sum(budget_lines.mapped('qty_remain'))
-                    max_budget_price = max(budget_lines.mapped('unit_price'))
-                    if line.product_qty > total_remain or line.price_unit > max_budget_price:
-                        over = True
-            line.over_budget = over
-
-    def write(self, vals):
-        res = super(PurchaseOrderLine, self).write(vals)
+            verdict = verdicts[line]
+            line.over_budget = verdict.has_budget and (verdict.over_qty or verdict.over_price)
 
-        self.env.flush_all()
+    def _budget_keys(self):
+        return {
+            (line.budget_item_id.id, line.product_id.id)
+            for line in self
+            if line.budget_item_id and line.product_id
+        }
 
+    def _budget_index(self):
+        # semua budget.item.line yang relevan dibaca sekali, diindeks per (budget item, product)
+        keys = self._budget_keys()
+        if not keys:
+            return {}
+        budget_lines = self.env['budget.item.line'].search([
+            ('item_id', 'in', list({item_id for item_id, _product_id in keys})),
+            ('product_id', 'in', list({product_id for _item_id, product_id in keys})),
+        ])
+        index = {}
+        for bl in budget_lines:
+            key = (bl.item_id.id, bl.product_id.id)
+            if key not in keys:
+                continue
+            stats = index.get(key)
+            if stats is None:
+                index[key] = {
+                    'qty_remain': bl.qty_remain,
+                    'max_price': bl.unit_price,
+                    'budget_amount': bl.subtotal,
+                    'min_qty_plan': bl.qty_plan,
+                    'min_price': bl.unit_price,
+                }
+            else:
+                stats['qty_remain'] += bl.qty_remain
+                stats['max_price'] = max(stats['max_price'], bl.unit_price)
+                stats['budget_amount'] += bl.subtotal
+                stats['min_qty_plan'] = min(stats['min_qty_plan'], bl.qty_plan)
+                stats['min_price'] = min(stats['min_price'], bl.unit_price)
+        return index
+
+    @instrument
+    def _evaluate_budget(self, index=None):
+        if index is None:
+            index = self._budget_index()
+        verdicts = {}
         for line in self:
-            memo_line = self.env['memo.over.budget.line'].search([
-                ('purchase_line_id', '=', line.id)
-            ], limit=1)
+            stats = None
+            if line.budget_item_id and line.product_id:
+                stats = index.get((line.budget_item_id.id, line.product_id.id))
+            qty_remain = stats['qty_remain'] if stats else 0.0
+            max_price = stats['max_price'] if stats else 0.0
+            over_qty = line.product_qty > qty_remain
+            over_price = line.price_unit > max_price
+
+            if over_qty and over_price:
+                posisi_over = 'both'
+            elif over_qty:
+                posisi_over = 'amount'
+            elif over_price:
+                posisi_over = 'price'
+            else:
+                posisi_over = False
 
-            if memo_line:
-                memo_line.request_qty = line.product_qty
-                memo_line.request_price = line.price_unit
-                memo_line.request_amount = line.price_subtotal
+            verdicts[line] = BudgetVerdict(
+                has_budget=bool(stats),
+                over_qty=over_qty,
+                over_price=over_price,
+                posisi_over=posisi_over,
+                qty_remain=qty_remain,
+                max_price=max_price,
+                budget_amount=stats['budget_amount'] if stats else 0.0,
+                need_memo=bool(stats) and (
+                    line.product_qty > stats['min_qty_plan'] or line.price_unit > stats['min_price']
+                ),
+            )
+        return verdicts
+
+    @api.model
+    def _plan_values(self, bl, ledger, mode):
+        # mode: 'sync' (write PO line), 'grow' (confirm PO, nilai hanya naik),
+        # 'release' (hapus PO, nilai kembali ke initial plan)
+        total_po_qty = ledger.committed_qty if ledger else 0.0
+        max_po_price = ledger.max_price if ledger and ledger.committed_count else None
+
+        if mode == 'grow':
+            qty_plan = max(total_po_qty, bl.qty_plan)
+            unit_price = max(max_po_price or 0.0, bl.unit_price)
+        elif mode == 'release':
+            qty_plan = max(total_po_qty, bl.initial_qty_plan)
+            unit_price = max(max_po_price or 0.0, bl.initial_unit_price)
+        else:
+            if total_po_qty > bl.qty_plan:
+                qty_plan = total_po_qty
+            else:
+                qty_plan = max(total_po_qty, bl.initial_qty_plan)
+            if max_po_price is not None and max_po_price > bl.unit_price:
+                unit_price = max_po_price
+            else:
+                unit_price = bl.initial_unit_price
+
+        vals = {}
+        if float_compare(qty_plan, bl.qty_plan, precision_digits=PLAN_PRECISION):
+            vals['qty_plan'] = qty_plan
+        if float_compare(unit_price, bl.unit_price, precision_digits=PLAN_PRECISION):
+            vals['unit_price'] = unit_price
+        return vals
+
+    @api.model
+    @instrument
+    def _resync_budget_plan(self, keys, mode):
+        if not keys:
+            return
+        consumption = self.env['budget.consumption']._read_consumption(keys)
+        budget_lines = self.env['budget.item.line'].search([
+            ('item_id', 'in', list({item_id for item_id, _product_id in keys})),
+            ('product_id', 'in', list({product_id for _item_id, product_id in keys})),
+        ])
+
+        def ledger_of(bl):
+            return consumption.get((bl.item_id.id, bl.product_id.id))
+
+        # hanya baris yang nilainya berubah yang dikunci (urut id) lalu dibaca ulang
+        candidates = budget_lines.filtered(
+            lambda bl: (bl.item_id.id, bl.product_id.id) in keys and self._plan_values(bl, ledger_of(bl), mode)
+        )
+        if not candidates:
+            return
+        lock_rows(candidates)
+        candidates.invalidate_recordset(['qty_plan', 'unit_price', 'initial_qty_plan', 'initial_unit_price'])
+
+        to_write = defaultdict(lambda: self.env['budget.item.line'])
+        for bl in candidates:
+            vals = self._plan_values(bl, ledger_of(bl), mode)
+            if vals:
+                to_write[tuple(sorted(vals.items()))] |= bl
+
+        for vals, lines in to_write.items():
+            lines.write(dict(vals))
+
+    @instrument
+    def write(self, vals):
+        if not BUDGET_TRIGGER_FIELDS.intersection(vals):
+            return super(PurchaseOrderLine, self).write(vals)
 
-                budget_lines = line.budget_item_id.line_ids.filtered(
-                    lambda l: l.product_id == line.product_id
-                )
-                budget_qty = sum(budget_lines.mapped('qty_remain')) if budget_lines else 0.0
-                budget_price = max(budget_lines.mapped('unit_price')) if budget_lines else 0.0
+        # pasangan lama juga harus di re-plan jika product / budget item berganti
+        old_keys = self._budget_keys() if {'product_id', 'budget_item_id'}.intersection(vals) else set()
 
-                if line.product_qty > budget_qty and line.price_unit > budget_price:
-                    posisi_over = 'both'
-                elif line.product_qty > budget_qty:
-                    posisi_over = 'amount'
-                elif line.price_unit > budget_price:
-                    posisi_over = 'price'
-                else:
-                    posisi_over = False
+        res = super(PurchaseOrderLine, self).write(vals)
 
-                memo_line.posisi_over = posisi_over
+        self.flush_model(['product_id', 'budget_item_id', 'order_id', 'product_qty', 'price_unit', 'price_subtotal'])
+        self.env['purchase.order'].flush_model(['state'])
+
+        keys = self._budget_keys() | old_keys
+        self.env['budget.recompute.queue']._schedule(keys)
+
+        memo_lines = self.env['memo.over.budget.line'].search([
+            ('purchase_line_id', 'in', self.ids)
+        ], order='id')
+        memo_by_line = {}
+        for memo_line in memo_lines:
+            memo_by_line.setdefault(memo_line.purchase_line_id.id, memo_line)
+
+        verdicts = self.filtered(lambda l: l.id in memo_by_line)._evaluate_budget()
+        for line, verdict in verdicts.items():
+            memo_by_line[line.id].write({
+                'request_qty': line.product_qty,
+                'request_price': line.price_unit,
+                'request_amount': line.price_subtotal,
+                'posisi_over': verdict.posisi_over,
+            })
 
-            if line.budget_item_id and line.product_id:
-                budget_lines = line.budget_item_id.line_ids.filtered(
-                    lambda l: l.product_id == line.product_id
-                )
-                for bl in budget_lines:
-                    total_po_qty = self.env['purchase.order.line'].sudo().search([
-                        ('budget_item_id', '=', line.budget_item_id.id),
-                        ('product_id', '=', line.product_id.id),
-                        ('order_id.state', 'in', ['purchase', 'done'])
-                    ]).mapped('product_qty')
-                    total_po_qty = sum(total_po_qty)
-
-                    max_po_price = self.env['purchase.order.line'].sudo().search([
-                        ('budget_item_id', '=', line.budget_item_id.id),
-                        ('product_id', '=', line.product_id.id),
-                        ('order_id.state', 'in', ['purchase', 'done'])
-                    ]).mapped('price_unit')
-                    max_po_price = max(max_po_price) if max_po_price else bl.initial_unit_price
-
-                    if max_po_price > bl.unit_price:
-                        bl.unit_price = max_po_price
-                    else:
-                        bl.unit_price = bl.initial_unit_price
-
-                    if total_po_qty > bl.qty_plan:
-                        bl.qty_plan = total_po_qty
-                    else:
-                        bl.qty_plan = max(total_po_qty, bl.initial_qty_plan)
-
-            if 'product_qty' in vals or 'price_unit' in vals:
-                if line.order_id.memo_over_budget_done:
-                    line.order_id.memo_over_budget_done = False
+        self.env['budget.recompute.queue']._schedule(keys, 'sync')
+
+        if 'product_qty' in vals or 'price_unit' in vals:
+            self.order_id.filtered('memo_over_budget_done').memo_over_budget_done = False
 
         return res
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super(PurchaseOrderLine, self).create(vals_list)
+        self.env['budget.recompute.queue']._schedule(lines.filtered(lambda l: l.state in PLAN_STATES)._budget_keys())
+        return lines
+
     def unlink(self):
-        for line in self:
-            memo_line = self.env['memo.over.budget.line'].search([
-                ('purchase_line_id', '=', line.id)
-            ])
-            memo_line.unlink()
-        return super(PurchaseOrderLine, self).unlink()
+        # memo.over.budget.line ikut terhapus lewat ondelete cascade purchase_line_id
+        keys = self._budget_keys()
+        res = super(PurchaseOrderLine, self).unlink()
+        self.env['budget.recompute.queue']._schedule(keys)
+        return res
 
 
 class PurchaseOrder(models.Model):
@@ -120,7 +283,7 @@ class PurchaseOrder(models.Model):
 
     has_over_budget = fields.Boolean(string="Has Over Budget", compute="_compute_has_over_budget", store=True)
     memo_over_budget_done = fields.Boolean(string="Memo Over Budget Done", default=False)
-    memo_over_budget_id = fields.Many2one('memo.over.budget', string="Budget Revision", readonly=True)
+    memo_over_budget_id = fields.Many2one('memo.over.budget', string="Budget Revision", readonly=True, index='btree_not_null')
     need_confirm_memo = fields.Boolean(string="Need Confirm Memo", compute="_compute_need_confirm_memo", store=True)
 
     @api.depends('order_line.over_budget')
@@ -129,74 +292,135 @@ class PurchaseOrder(models.Model):
             order.has_over_budget = any(line.over_budget for line in order.order_line)
 
     @api.depends('order_line.price_unit', 'order_line.product_qty')
+    @instrument
     def _compute_need_confirm_memo(self):
+        verdicts = self.order_line._evaluate_budget()
         for order in self:
-            need = False
-            for line in order.order_line:
-                if line.budget_item_id:
-                    budget_lines = line.budget_item_id.line_ids.filtered(
-                        lambda l: l.product_id == line.product_id
-                    )
-                    for bl in budget_lines:
-                        if line.product_qty > bl.qty_plan or line.price_unit > bl.unit_price:
-                            need = True
+            need = any(verdicts[line].need_memo for line in order.order_line)
             order.need_confirm_memo = need and not order.memo_over_budget_done
 
+    @instrument
     def action_memo_over_budget(self):
-        self.ensure_one()
-        memo = self.env['memo.over.budget'].search([
-            ('purchase_order_id', '=', self.id)
-        ], limit=1)
-
-        if not memo:
-            memo = self.env['memo.over.budget'].create({
-                'purchase_order_id': self.id,
-                'reason': '',
-            })
-
-            for pol in self.order_line.filtered(lambda l: l.over_budget):
-                budget_lines = pol.budget_item_id.line_ids.filtered(
-                    lambda l: l.product_id == pol.product_id
-                )
-                budget_qty = sum(budget_lines.mapped('qty_remain')) if budget_lines else 0.0
-                budget_price = max(budget_lines.mapped('unit_price')) if budget_lines else 0.0
-                budget_amount = sum(budget_lines.mapped(
-                    'subtotal')) if 'subtotal' in budget_lines._fields else budget_qty * budget_price
-
-                posisi_over = False
-                if pol.product_qty > budget_qty and pol.price_unit > budget_price:
-                    posisi_over = 'both'
-                elif pol.product_qty > budget_qty:
-                    posisi_over = 'amount'
-                elif pol.price_unit > budget_price:
-                    posisi_over = 'price'
-
-                self.env['memo.over.budget.line'].create({
-                    'memo_id': memo.id,
-                    'description': '',
-                    'product_id': pol.product_id.id,
-                    'budget_item_id': pol.budget_item_id.id,
-                    'request_qty': pol.product_qty,
-                    'budget_qty': budget_qty,
-                    'request_price': pol.price_unit,
-                    'budget_price': budget_price,
-                    'request_amount': pol.price_subtotal,
-                    'budget_amount': budget_amount,
-                    'posisi_over': posisi_over,
-                    'purchase_line_id': pol.id,
-                })
-
-        self.memo_over_budget_id = memo.id
+        # memo dan memo line untuk banyak PO dibuat sekaligus (multi-create)
+        memo_by_order = {}
+        for memo in self.env['memo.over.budget'].search([('purchase_order_id', 'in', self.ids)], order='id'):
+            memo_by_order.setdefault(memo.purchase_order_id.id, memo)
+
+        missing = self.filtered(lambda o: o.id not in memo_by_order)
+        if missing:
+            new_memos = self.env['memo.over.budget'].create([
+                {'purchase_order_id': order.id, 'reason': ''} for order in missing
+            ])
+            memo_by_order.update(zip(missing.ids, new_memos))
+
+            verdicts = missing.order_line.filtered(lambda l: l.over_budget)._evaluate_budget()
+            self.env['memo.over.budget.line'].create([{
+                'memo_id': memo_by_order[pol.order_id.id].id,
+                'description': '',
+                'product_id': pol.product_id.id,
+                'budget_item_id': pol.budget_item_id.id,
+                'request_qty': pol.product_qty,
+                'budget_qty': verdict.qty_remain,
+                'request_price': pol.price_unit,
+                'budget_price': verdict.max_price,
+                'request_amount': pol.price_subtotal,
+                'budget_amount': verdict.budget_amount,
+                'posisi_over': verdict.posisi_over,
+                'purchase_line_id': pol.id,
+            } for pol, verdict in verdicts.items()])
 
+        for order in self:
+            if order.memo_over_budget_id != memo_by_order[order.id]:
+                order.memo_over_budget_id = memo_by_order[order.id]
+
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window',
+                'name': 'Memo Over Budget',
+                'res_model': 'memo.over.budget',
+                'view_mode': 'form',
+                'target': 'new',
+                'res_id': memo_by_order[self.id].id,
+            }
         return {
             'type': 'ir.actions.act_window',
             'name': 'Memo Over Budget',
             'res_model': 'memo.over.budget',
-            'view_mode': 'form',
-            'target': 'new',
-            'res_id': memo.id,
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', [memo.id for memo in memo_by_order.values()])],
+            'target': 'current',
         }
 
+    @instrument
+    def get_budget_availability(self):
+        # read-only: semua line dievaluasi dengan satu prefetch budget, urut sesuai self;
+        # PO yang lolos mengurangi sisa qty untuk PO berikutnya di batch yang sama
+        lines = self.order_line.filtered(lambda l: l.budget_item_id and l.product_id)
+        index = lines._budget_index()
+        remaining = {key: stats['qty_remain'] for key, stats in index.items()}
+        report = {}
+        for order in self:
+            usage = defaultdict(float)
+            issues = []
+            for line in order.order_line:
+                if not (line.budget_item_id and line.product_id):
+                    continue
+                key = (line.budget_item_id.id, line.product_id.id)
+                usage[key] += line.product_qty
+                stats = index.get(key)
+                if not stats:
+                    continue
+                over_qty = usage[key] > remaining[key]
+                over_price = line.price_unit > stats['max_price']
+                if over_qty or over_price:
+                    issues.append({
+                        'line_id': line.id,
+                        'budget_item_id': key[0],
+                        'product_id': key[1],
+                        'qty': line.product_qty,
+                        'qty_available': max(remaining[key] - (usage[key] - line.product_qty), 0.0),
+                        'price': line.price_unit,
+                        'max_price': stats['max_price'],
+                        'posisi_over': 'both' if over_qty and over_price else 'amount' if over_qty else 'price',
+                    })
+
+            # memo over budget yang sudah disetujui tetap boleh confirm
+            available = not issues or order.memo_over_budget_done
+            if available:
+                for key, qty in usage.items():
+                    if key in remaining:
+                        remaining[key] -= qty
+            report[order.id] = {'available': available, 'issues': issues}
+        return report
+
+    def action_confirm_within_budget(self):
+        # confirm semua PO yang masih muat di budget, sisanya dilewati tanpa membatalkan batch
+        orders = self.filtered(lambda o: o.state in ('draft', 'sent'))
+        report = orders.get_budget_availability()
+        # flag has_over_budget yang masih tersimpan tetap ditolak button_confirm, jadi ikut dilewati
+        # agar satu PO tidak membatalkan seluruh batch
+        passed = orders.filtered(
+            lambda o: report[o.id]['available'] and (o.memo_over_budget_done or not o.has_over_budget)
+        )
+        if passed:
+            passed.button_confirm()
+        skipped = orders - passed
+        message = f"{len(passed)} PO dikonfirmasi."
+        if skipped:
+            message += f" {len(skipped)} PO dilewati karena over budget: {', '.join(skipped.mapped('name'))}"
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Confirm Within Budget',
+                'message': message,
+                'type': 'warning' if skipped else 'success',
+                'sticky': bool(skipped),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    @instrument
     def button_confirm(self):
         for order in self:
             if order.has_over_budget and not order.memo_over_budget_done:
@@ -206,66 +430,20 @@ class PurchaseOrder(models.Model):
 
         res = super(PurchaseOrder, self).button_confirm()
 
-        for order in self:
-            for line in order.order_line:
-                if line.budget_item_id and line.product_id:
-                    budget_lines = line.budget_item_id.line_ids.filtered(
-                        lambda l: l.product_id == line.product_id
-                    )
-                    for bl in budget_lines:
-                        total_po_qty = self.env['purchase.order.line'].search([
-                            ('budget_item_id', '=', line.budget_item_id.id),
-                            ('product_id', '=', line.product_id.id),
-                            ('order_id.state', 'in', ['purchase', 'done'])
-                        ]).mapped('product_qty')
-                        total_po_qty = sum(total_po_qty)
-
-                        if total_po_qty > bl.qty_plan:
-                            bl.qty_plan = total_po_qty
-
-                        max_po_price = self.env['purchase.order.line'].search([
-                            ('budget_item_id', '=', line.budget_item_id.id),
-                            ('product_id', '=', line.product_id.id),
-                            ('order_id.state', 'in', ['purchase', 'done'])
-                        ]).mapped('price_unit')
-                        max_po_price = max(max_po_price) if max_po_price else 0.0
-
-                        if max_po_price > bl.unit_price:
-                            bl.unit_price = max_po_price
+        self.env['budget.recompute.queue']._schedule(self.order_line._budget_keys(), 'grow')
 
         return res
 
+    def write(self, vals):
+        res = super(PurchaseOrder, self).write(vals)
+        if 'state' in vals:
+            self.env['budget.recompute.queue']._schedule(self.order_line._budget_keys())
+        return res
+
+    @instrument
     def unlink(self):
-        for order in self:
-            for line in order.order_line:
-                if line.budget_item_id and line.product_id:
-                    budget_lines = line.budget_item_id.line_ids.filtered(
-                        lambda l: l.product_id == line.product_id
-                    )
-                    for bl in budget_lines:
-                        total_po_qty = self.env['purchase.order.line'].search([
-                            ('budget_item_id', '=', line.budget_item_id.id),
-                            ('product_id', '=', line.product_id.id),
-                            ('order_id.state', 'in', ['purchase', 'done']),
-                            ('order_id', 'not in', self.ids)
-                        ]).mapped('product_qty')
-                        total_po_qty = sum(total_po_qty)
-
-                        if total_po_qty > bl.initial_qty_plan:
-                            bl.qty_plan = total_po_qty
-                        else:
-                            bl.qty_plan = bl.initial_qty_plan
-
-                        max_po_price = self.env['purchase.order.line'].search([
-                            ('budget_item_id', '=', line.budget_item_id.id),
-                            ('product_id', '=', line.product_id.id),
-                            ('order_id.state', 'in', ['purchase', 'done']),
-                            ('order_id', 'not in', self.ids)
-                        ]).mapped('price_unit')
-                        max_po_price = max(max_po_price) if max_po_price else 0.0
-
-                        if max_po_price > bl.initial_unit_price:
-                            bl.unit_price = max_po_price
-                        else:
-                            bl.unit_price = bl.initial_unit_price
-        return super(PurchaseOrder, self).unlink()
+        keys = self.order_line._budget_keys()
+        res = super(PurchaseOrder, self).unlink()
+        self.env['budget.recompute.queue']._schedule(keys)
+        self.env['budget.recompute.queue']._schedule(keys, 'release')
+        return res
@@ -0,0 +1,9 @@
+from . import test_budget_perf
+from . import test_budget_rollup
+from . import test_budget_indexes
+from . import test_budget_concurrency
+from . import test_budget_template
+from . import test_budget_queue
+from . import test_budget_purchase
+from . import test_budget_prices
+from . import test_budget_report
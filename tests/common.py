@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+
+from odoo import Command, fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+# skala data uji, bisa diubah lewat env, contoh: PD_BUDGET_BENCH_SCALE="budgets=20,orders=500"
+DEFAULT_SCALE = {
+    'templates': 1,     # jumlah template
+    'parents': 3,       # detail parent per template
+    'children': 4,      # detail child per parent
+    'budgets': 2,       # budget per template
+    'lines': 3,         # budget line (product) per item child
+    'orders': 10,       # PO per budget
+    'order_lines': 3,   # line per PO
+    'invoices': 3,      # PO confirm per budget yang dibuat vendor bill lalu dibayar
+}
+
+
+def bench_scale():
+    scale = dict(DEFAULT_SCALE)
+    for part in filter(None, os.environ.get('PD_BUDGET_BENCH_SCALE', '').split(',')):
+        key, _sep, value = part.partition('=')
+        if key.strip() in scale:
+            scale[key.strip()] = int(value)
+    return scale
+
+
+def emit_benchmark(name, scale, results):
+    # hasil benchmark untuk tren: selalu di-log, dan ditulis ke file jika PD_BUDGET_BENCH_OUTPUT diisi
+    payload = {'suite': name, 'scale': scale, 'results': results}
+    _logger.info("pd_budget benchmark: %s", json.dumps(payload, sort_keys=True))
+    path = os.environ.get('PD_BUDGET_BENCH_OUTPUT')
+    if path:
+        report = {}
+        if os.path.exists(path):
+            with open(path) as fp:
+                report = json.load(fp)
+        report[name] = payload
+        with open(path, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+
+
+class BudgetTestCommon(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.scale = bench_scale()
+        cls.env.user.groups_id |= cls.env.ref('purchase.group_purchase_manager')
+        cls.vendor = cls.partner_a
+        cls.budget_products = cls.env['product.product'].create([{
+            'name': f'Budget Product {index}',
+            'type': 'consu',
+            'purchase_method': 'purchase',
+            'standard_price': 10.0,
+        } for index in range(cls.scale['lines'])])
+
+        cls.templates = cls._create_templates(cls.scale['templates'])
+        cls.budgets = cls._create_budgets(cls.templates, cls.scale['budgets'])
+
+        orders = cls._create_orders(cls.budgets, cls.scale['orders'])
+        cls.confirmed_orders = orders[:len(orders) // 2]
+        cls.draft_orders = orders - cls.confirmed_orders
+        cls.confirmed_orders.button_confirm()
+        cls._pay_orders(cls.confirmed_orders[:cls.scale['invoices'] * len(cls.budgets)])
+
+        # lipat queue re-plan supaya setiap test mulai dari plan yang sudah terbaru
+        cls.env['budget.recompute.queue']._cron_process_queue()
+        cls.env.flush_all()
+
+    @classmethod
+    def _create_templates(cls, count):
+        Detail = cls.env['template.detail']
+        templates = cls.env['budget.template'].create([
+            {'name': f'Template {index}', 'type': 'project'} for index in range(count)
+        ])
+        parents = Detail.create([{
+            'template_id': template.id,
+            'name': f'Parent {index}',
+            'type': 'group',
+        } for template in templates for index in range(cls.scale['parents'])])
+        Detail.create([{
+            'template_id': parent.template_id.id,
+            'parent_id': parent.id,
+            'name': f'{parent.name} / Child {index}',
+            'type': 'item',
+            'check_detail': True,
+        } for parent in parents for index in range(cls.scale['children'])])
+        return templates
+
+    @classmethod
+    def _budget_vals(cls, template):
+        today = fields.Date.today()
+        return {
+            'date': today,
+            'budget_type': 'project',
+            'start_periode': today.replace(month=1, day=1),
+            'end_periode': today.replace(month=12, day=31),
+            'template_id': template.id,
+        }
+
+    @classmethod
+    def _create_budgets(cls, templates, count, qty_plan=1000.0, unit_price=10.0):
+        budgets = cls.env['budget.budget'].create([
+            cls._budget_vals(template) for template in templates for _index in range(count)
+        ])
+        cls.env['budget.item.line'].create([{
+            'item_id': leaf.id,
+            'product_id': product.id,
+            'name': product.name,
+            'uom_id': product.uom_id.id,
+            'qty_plan': qty_plan,
+            'unit_price': unit_price,
+        } for leaf in budgets.item_ids.filtered('parent_id') for product in cls.budget_products])
+        return budgets
+
+    @classmethod
+    def _order_line_vals(cls, item, product, qty=1.0, price=10.0):
+        return Command.create({
+            'product_id': product.id,
+            'name': product.name,
+            'product_qty': qty,
+            'price_unit': price,
+            'product_uom': product.uom_id.id,
+            'date_planned': fields.Datetime.now(),
+            'budget_item_id': item.id,
+        })
+
+    @classmethod
+    def _create_orders(cls, budgets, count, qty=1.0, price=10.0):
+        # line PO dibagi merata (round robin) ke semua pasangan (item child, product)
+        pairs = [
+            (leaf, product)
+            for leaf in budgets.item_ids.filtered('parent_id')
+            for product in cls.budget_products
+        ]
+        per_order = cls.scale['order_lines']
+        return cls.env['purchase.order'].create([{
+            'partner_id': cls.vendor.id,
+            'order_line': [
+                cls._order_line_vals(*pairs[(index * per_order + offset) % len(pairs)], qty=qty, price=price)
+                for offset in range(per_order)
+            ],
+        } for index in range(count * len(budgets))])
+
+    @classmethod
+    def _pay_orders(cls, orders):
+        if not orders:
+            return
+        orders.action_create_invoice()
+        bills = orders.invoice_ids
+        bills.invoice_date = fields.Date.today()
+        bills.action_post()
+        cls.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=bills.ids,
+        ).create({'group_payment': False})._create_payments()
+
+    @classmethod
+    def _emit_results(cls, name, results):
+        emit_benchmark(name, cls.scale, results)
@@ -0,0 +1,159 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from psycopg2 import errors
+
+from odoo import SUPERUSER_ID, Command, api, fields
+from odoo.modules.registry import Registry
+from odoo.tests.common import BaseCase, get_db_name, tagged
+
+from .common import emit_benchmark
+
+RETRY_ERRORS = (errors.SerializationFailure, errors.DeadlockDetected, errors.LockNotAvailable)
+MAX_RETRIES = 10
+
+
+@tagged('post_install', '-at_install', '-standard', 'budget_stress')
+class TestBudgetConcurrency(BaseCase):
+    # cursor lain hanya melihat data yang sudah di-commit: data dibuat dan dihapus sendiri,
+    # jadi test ini hanya jalan jika dipilih, contoh: --test-tags budget_stress
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry = Registry(get_db_name())
+        cls.threads = int(os.environ.get('PD_BUDGET_STRESS_THREADS', 4))
+        cls.orders_per_thread = int(os.environ.get('PD_BUDGET_STRESS_ORDERS', 10))
+
+    @contextmanager
+    def environment(self):
+        with self.registry.cursor() as cr:
+            yield api.Environment(cr, SUPERUSER_ID, {})
+
+    def _seed(self, deferred):
+        today = fields.Date.today()
+        with self.environment() as env:
+            params = env['ir.config_parameter']
+            data = {'deferred_param': params.get_param('budget.deferred_recompute')}
+            params.set_param('budget.deferred_recompute', deferred and '1')
+
+            vendor = env['res.partner'].create({'name': 'Budget Stress Vendor'})
+            product = env['product.product'].create({
+                'name': 'Budget Stress Product',
+                'type': 'consu',
+                'purchase_method': 'purchase',
+            })
+            budget = env['budget.budget'].create({
+                'date': today,
+                'budget_type': 'project',
+                'start_periode': today.replace(month=1, day=1),
+                'end_periode': today.replace(month=12, day=31),
+                'force_sync_recompute': not deferred,
+            })
+            parent = env['budget.item'].create({'budget_id': budget.id, 'name': 'Stress', 'type': 'group'})
+            item = env['budget.item'].create({
+                'budget_id': budget.id,
+                'parent_id': parent.id,
+                'name': 'Stress Item',
+                'type': 'item',
+            })
+            env['budget.item.line'].create({
+                'item_id': item.id,
+                'product_id': product.id,
+                'name': product.name,
+                'uom_id': product.uom_id.id,
+                'qty_plan': 1000000.0,
+                'unit_price': 10.0,
+            })
+            # semua PO memakai budget item dan product yang sama -> baris yang diperebutkan
+            orders = env['purchase.order'].create([{
+                'partner_id': vendor.id,
+                'order_line': [Command.create({
+                    'product_id': product.id,
+                    'name': product.name,
+                    'product_qty': 1.0,
+                    'price_unit': 10.0,
+                    'product_uom': product.uom_id.id,
+                    'date_planned': fields.Datetime.now(),
+                    'budget_item_id': item.id,
+                })],
+            } for _index in range(self.threads * self.orders_per_thread)])
+            data.update(vendor=vendor.id, product=product.id, budget=budget.id, item=item.id, orders=orders.ids)
+        return data
+
+    def _cleanup(self, data):
+        with self.environment() as env:
+            orders = env['purchase.order'].browse(data['orders']).exists()
+            orders.button_cancel()
+            orders.unlink()
+            env['budget.recompute.queue'].search([('budget_item_id', '=', data['item'])]).unlink()
+            env['budget.budget'].browse(data['budget']).unlink()
+            env['product.product'].browse(data['product']).unlink()
+            env['res.partner'].browse(data['vendor']).unlink()
+            env['ir.config_parameter'].set_param('budget.deferred_recompute', data['deferred_param'] or False)
+
+    def _confirm_orders(self, order_ids, stats):
+        for order_id in order_ids:
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    with self.environment() as env:
+                        env['purchase.order'].browse(order_id).button_confirm()
+                    stats['confirmed'] += 1
+                    break
+                except RETRY_ERRORS:
+                    stats['retries'] += 1
+                    time.sleep(random.uniform(0.0, 0.05 * (attempt + 1)))
+            else:
+                stats['failed'] += 1
+
+    def _run_scenario(self, deferred):
+        data = self._seed(deferred)
+        try:
+            chunks = [data['orders'][index::self.threads] for index in range(self.threads)]
+            stats = [Counter() for _chunk in chunks]
+            workers = [
+                threading.Thread(target=self._confirm_orders, args=(chunk, stat))
+                for chunk, stat in zip(chunks, stats)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            total = sum(stats, Counter())
+
+            # lipat queue lalu cek ledger: setiap PO (qty 1) tercatat tepat sekali
+            with self.environment() as env:
+                env['budget.recompute.queue']._cron_process_queue()
+            with self.environment() as env:
+                orders = env['purchase.order'].browse(data['orders'])
+                line = env['budget.item.line'].search([('item_id', '=', data['item'])])
+                self.assertEqual(total['failed'], 0, f"{total['failed']} PO gagal setelah {MAX_RETRIES} retry")
+                self.assertTrue(all(order.state == 'purchase' for order in orders))
+                self.assertAlmostEqual(line.qty_used, len(orders))
+
+            return {
+                'orders': len(data['orders']),
+                'confirmed': total['confirmed'],
+                'retries': total['retries'],
+                'failed': total['failed'],
+                'seconds': round(elapsed, 4),
+                'confirm_per_second': round(total['confirmed'] / elapsed, 2) if elapsed else None,
+            }
+        finally:
+            self._cleanup(data)
+
+    def test_concurrent_confirm_same_item(self):
+        # strict: ledger dan plan ditulis di transaksi confirm; queued: confirm hanya INSERT ke queue
+        results = {
+            'strict': self._run_scenario(deferred=False),
+            'queued': self._run_scenario(deferred=True),
+        }
+        emit_benchmark(
+            'budget_stress', {'threads': self.threads, 'orders_per_thread': self.orders_per_thread}, results,
+        )
@@ -0,0 +1,88 @@
+import re
+
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from ..models.purchase import PLAN_STATES
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetIndexes(BudgetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.order = cls.draft_orders[0]
+        cls.order.action_memo_over_budget()
+        cls.order_lines = cls.draft_orders.order_line
+        cls.items = cls.order_lines.budget_item_id
+        cls.env.flush_all()
+
+    def explain(self, query):
+        # seq scan dimatikan: jika tetap muncul berarti tidak ada index yang bisa dipakai
+        self.cr.execute("SET LOCAL enable_seqscan = off")
+        self.cr.execute(SQL("EXPLAIN %s", query))
+        return "\n".join(row[0] for row in self.cr.fetchall())
+
+    def assertIndexScan(self, query, indexes):
+        # indexes: {tabel: nama index modul yang boleh dipakai}; full scan primary key tidak dihitung
+        plan = self.explain(query)
+        for table, names in indexes.items():
+            self.assertNotIn(f"Seq Scan on {table} ", plan, plan)
+            pattern = "|".join(re.escape(name) for name in names)
+            self.assertRegex(
+                plan, rf"(Index (Only )?Scan (Backward )?using|Bitmap Index Scan on) ({pattern})\b", plan,
+            )
+
+    def search_query(self, model, domain):
+        return self.env[model]._search(domain).select()
+
+    def test_po_line_write_queries(self):
+        keys = self.order_lines._budget_keys()
+        # memo line milik PO line yang ditulis
+        self.assertIndexScan(
+            self.search_query('memo.over.budget.line', [('purchase_line_id', 'in', self.order_lines.ids)]),
+            {'memo_over_budget_line': ['memo_over_budget_line__purchase_line_id_index']},
+        )
+        # refresh ledger: PO line per (budget item, product) dan state PO
+        domain = self.env['budget.consumption']._domain_for_keys(keys, 'budget_item_id', 'product_id')
+        self.assertIndexScan(
+            self.search_query('purchase.order.line', domain + [('order_id.state', 'in', PLAN_STATES)]),
+            {'purchase_order_line': ['purchase_order_line_budget_item_product_index']},
+        )
+        # re-plan / evaluasi budget: budget.item.line per (budget item, product)
+        self.assertIndexScan(
+            self.search_query('budget.item.line', self.env['budget.consumption']._domain_for_keys(keys, 'item_id', 'product_id')),
+            {'budget_item_line': ['budget_item_line_item_product_index']},
+        )
+        self.assertIndexScan(
+            self.search_query('budget.consumption', self.env['budget.consumption']._domain_for_keys(keys, 'item_id', 'product_id')),
+            {'budget_consumption': ['budget_consumption_item_product_uniq']},
+        )
+
+    def test_po_line_unlink_queries(self):
+        # memo line dihapus lewat ondelete cascade dari FK purchase_line_id
+        self.assertIndexScan(
+            SQL("DELETE FROM memo_over_budget_line WHERE purchase_line_id IN %s", tuple(self.order_lines.ids)),
+            {'memo_over_budget_line': ['memo_over_budget_line__purchase_line_id_index']},
+        )
+
+    def test_compute_memo_over_budget_ids_queries(self):
+        self.assertIndexScan(
+            self.search_query('purchase.order.line', [
+                ('budget_item_id', 'in', self.items.ids),
+                ('order_id.memo_over_budget_id', '!=', False),
+            ]),
+            {
+                'purchase_order_line': [
+                    'purchase_order_line__budget_item_id_index',
+                    'purchase_order_line_budget_item_product_index',
+                ],
+                'purchase_order': ['purchase_order__memo_over_budget_id_index'],
+            },
+        )
+        self.assertIndexScan(
+            self.search_query('memo.over.budget.line', [('budget_item_id', 'in', self.items.ids)]),
+            {'memo_over_budget_line': ['memo_over_budget_line__budget_item_id_index']},
+        )
@@ -0,0 +1,184 @@
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+
+from odoo import fields, release
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+# batas query dan detik per operasi; naikkan hanya jika memang ada penambahan fitur
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), 'perf_thresholds.json')
+
+BUDGET_FORM_SPEC = {
+    'budget_number': {},
+    'date': {},
+    'budget_type': {},
+    'start_periode': {},
+    'end_periode': {},
+    'company_id': {'fields': {'display_name': {}}},
+    'currency_id': {'fields': {'display_name': {}}},
+    'notes': {},
+    'template_id': {'fields': {'display_name': {}}},
+    'template_update_mode': {},
+    'force_sync_recompute': {},
+    'recompute_pending': {},
+    'actual_to_date': {},
+    'burn_rate': {},
+    'forecast_actual': {},
+    'top_item_ids': {'fields': {
+        'code': {}, 'name': {}, 'budget_plan': {}, 'request': {},
+        'remaining': {}, 'over_budget': {}, 'actual': {}, 'is_parent': {},
+    }},
+}
+
+
+@tagged('post_install', '-at_install', 'budget_perf')
+class TestBudgetPerf(BudgetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(THRESHOLDS_FILE) as fp:
+            cls.thresholds = json.load(fp)
+        # mesin CI yang lebih lambat bisa melonggarkan batas waktu, batas query tetap
+        cls.time_factor = float(os.environ.get('PD_BUDGET_BENCH_TIME_FACTOR', 1.0))
+        # PD_BUDGET_BENCH_CALIBRATE=1: batas tidak dicek, hasil ukur + margin ditulis ke perf_thresholds.json
+        cls.calibrate = bool(os.environ.get('PD_BUDGET_BENCH_CALIBRATE'))
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._emit_results('budget_perf', cls.results)
+        if cls.calibrate:
+            cls._write_thresholds()
+        super().tearDownClass()
+
+    @classmethod
+    def _write_thresholds(cls):
+        thresholds = dict(cls.thresholds)
+        for name, result in cls.results.items():
+            thresholds[name] = {
+                'queries': result['queries'] + max(2, result['queries'] // 10),
+                'seconds': round(max(result['seconds'] * 3, 0.5), 2),
+            }
+        thresholds['_environment'] = {
+            'odoo': release.version,
+            'postgresql': cls.cr._cnx.server_version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': cls.scale,
+            'date': fields.Date.to_string(fields.Date.today()),
+        }
+        with open(THRESHOLDS_FILE, 'w') as fp:
+            json.dump(thresholds, fp, indent=4, sort_keys=True)
+            fp.write('\n')
+
+    @contextmanager
+    def benchmark(self, name):
+        threshold = self.thresholds.get(name) if not self.calibrate else None
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start_count = self.cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            if threshold:
+                with self.assertQueryCount(threshold['queries']):
+                    yield
+            else:
+                yield
+                self.env.flush_all()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.results[name] = {
+                'queries': self.cr.sql_log_count - start_count,
+                'seconds': round(elapsed, 4),
+            }
+            if threshold:
+                self.results[name].update(
+                    max_queries=threshold['queries'],
+                    max_seconds=threshold['seconds'] * self.time_factor,
+                )
+        if threshold:
+            self.assertLessEqual(
+                elapsed, threshold['seconds'] * self.time_factor,
+                f"{name} butuh {elapsed:.3f}s, batas {threshold['seconds'] * self.time_factor:.3f}s",
+            )
+        elif not self.calibrate:
+            self.fail(f"Batas '{name}' belum ada di perf_thresholds.json, jalankan dengan PD_BUDGET_BENCH_CALIBRATE=1")
+
+    def test_template_instantiation(self):
+        with self.benchmark('template_instantiation'):
+            budget = self.env['budget.budget'].create(self._budget_vals(self.templates[0]))
+        self.assertEqual(
+            len(budget.item_ids), self.scale['parents'] * (self.scale['children'] + 1),
+        )
+
+    def test_po_line_write(self):
+        line = self.draft_orders[0].order_line[0]
+        with self.benchmark('po_line_write'):
+            line.write({'product_qty': line.product_qty + 1})
+
+        # field di luar BUDGET_TRIGGER_FIELDS tidak boleh membayar refresh ledger / re-plan
+        with self.benchmark('po_line_write_other'):
+            line.write({'name': f'{line.name} (rev)', 'date_planned': fields.Datetime.now()})
+        self.assertLess(self.results['po_line_write_other']['queries'], self.results['po_line_write']['queries'])
+
+    def test_po_confirm(self):
+        order = self.draft_orders[0]
+        with self.benchmark('po_confirm'):
+            order.button_confirm()
+        self.assertEqual(order.state, 'purchase')
+
+    def test_po_unlink(self):
+        order = self.draft_orders[0]
+        order.button_cancel()
+        with self.benchmark('po_unlink'):
+            order.unlink()
+        self.assertFalse(order.exists())
+
+    def test_po_line_unlink(self):
+        lines = self.draft_orders[0].order_line
+        with self.benchmark('po_line_unlink'):
+            lines.unlink()
+        self.assertFalse(lines.exists())
+
+    def test_memo_generate_confirm(self):
+        # qty melebihi plan sehingga PO over budget dan butuh memo
+        leaf = self.budgets[0].item_ids.filtered('parent_id')[0]
+        product = self.budget_products[0]
+        order = self.env['purchase.order'].create({
+            'partner_id': self.vendor.id,
+            'order_line': [self._order_line_vals(leaf, product, qty=5000.0, price=12.0)],
+        })
+        self.assertTrue(order.has_over_budget)
+
+        with self.benchmark('memo_generate'):
+            order.action_memo_over_budget()
+        memo = order.memo_over_budget_id
+        self.assertEqual(len(memo.line_ids), 1)
+
+        with self.benchmark('memo_confirm'):
+            memo.action_confirm_memo()
+        self.assertTrue(order.memo_over_budget_done)
+
+    def test_budget_form_read(self):
+        budget = self.budgets[0]
+        with self.benchmark('budget_form_read'):
+            values = budget.web_read(BUDGET_FORM_SPEC)
+        self.assertEqual(len(values[0]['top_item_ids']), self.scale['parents'])
+
+    def test_item_batch_create(self):
+        # jumlah query create batch budget.item tidak boleh tumbuh sebanding jumlah item
+        budget = self.env['budget.budget'].create(dict(self._budget_vals(self.templates[0]), template_id=False))
+        for size in (5, 50):
+            with self.benchmark(f'item_create_{size}'):
+                self.env['budget.item'].create([
+                    {'budget_id': budget.id, 'name': f'Batch {size} / {index}', 'type': 'group'}
+                    for index in range(size)
+                ])
+        self.assertLess(
+            self.results['item_create_50']['queries'], 2 * self.results['item_create_5']['queries'],
+        )
@@ -0,0 +1,42 @@
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetPrices(BudgetTestCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.priced_products = cls.env['product.product'].create([
+            {'name': f'Vendor Priced {index}', 'standard_price': 1.0} for index in range(5)
+        ])
+        cls.env['product.supplierinfo'].create([
+            {'partner_id': cls.vendor.id, 'product_tmpl_id': product.product_tmpl_id.id, 'price': price}
+            for index, product in enumerate(cls.priced_products)
+            for price in (10.0 + index, 20.0 + index)
+        ])
+        # harga vendor company lain tidak boleh dipakai
+        cls.env['product.supplierinfo'].create({
+            'partner_id': cls.vendor.id,
+            'product_tmpl_id': cls.priced_products[0].product_tmpl_id.id,
+            'price': 99.0,
+            'company_id': cls.env['res.company'].create({'name': 'Other Budget Company'}).id,
+        })
+
+    def _resolve_query_count(self, products):
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        prices = self.env['budget.item.line']._resolve_unit_prices(products)
+        return self.cr.sql_log_count - start, prices
+
+    def test_highest_vendor_price_per_company(self):
+        prices = self.env['budget.item.line']._resolve_unit_prices(self.priced_products)
+        for index, product in enumerate(self.priced_products):
+            self.assertAlmostEqual(prices[product.id], 20.0 + index)
+
+    def test_batch_resolves_in_constant_queries(self):
+        single, _prices = self._resolve_query_count(self.priced_products[0])
+        batch, _prices = self._resolve_query_count(self.priced_products)
+        self.assertEqual(single, batch)
@@ -0,0 +1,27 @@
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetPurchase(BudgetTestCommon):
+
+    def test_confirm_within_budget_skips_stale_over_budget(self):
+        leaf = self.budgets[0].item_ids.filtered('parent_id')[0]
+        product = self.budget_products[0]
+        stale, within = self.env['purchase.order'].create([{
+            'partner_id': self.vendor.id,
+            'order_line': [self._order_line_vals(leaf, product, qty=qty)],
+        } for qty in (1500.0, 1.0)])
+        self.assertTrue(stale.has_over_budget)
+
+        # plan dinaikkan setelah PO dibuat: availability lolos, flag over_budget yang tersimpan belum
+        leaf.line_ids.filtered(lambda l: l.product_id == product).qty_plan = 5000.0
+        orders = stale | within
+        self.assertTrue(orders.get_budget_availability()[stale.id]['available'])
+
+        action = orders.action_confirm_within_budget()
+
+        self.assertEqual(within.state, 'purchase')
+        self.assertEqual(stale.state, 'draft')
+        self.assertIn(stale.name, action['params']['message'])
@@ -0,0 +1,41 @@
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetQueue(BudgetTestCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.Queue = self.env['budget.recompute.queue']
+        self.leaf = self.budgets[0].item_ids.filtered('parent_id')[0]
+        self.product = self.budget_products[0]
+        self.key = (self.leaf.id, self.product.id)
+        self.line = self.leaf.line_ids.filtered(lambda l: l.product_id == self.product)
+        # plan yang sudah pernah dinaikkan (mis. lewat memo) di atas initial plan
+        self.line.write({'qty_plan': 5000.0, 'unit_price': 15.0})
+
+    def _committed_qty(self):
+        ledger = self.env['budget.consumption']._read_consumption({self.key}).get(self.key)
+        return ledger.committed_qty if ledger else 0.0
+
+    def _fold(self, *modes):
+        for mode in modes:
+            self.Queue._schedule({self.key}, mode)
+        self.assertEqual(self.Queue.search_count([('budget_item_id', '=', self.leaf.id)]), len(modes))
+        self.Queue._cron_process_queue()
+
+    def test_release_then_grow(self):
+        self._fold('release', 'grow')
+        self.assertAlmostEqual(self.line.qty_plan, max(self._committed_qty(), self.line.initial_qty_plan))
+        self.assertAlmostEqual(self.line.unit_price, self.line.initial_unit_price)
+
+    def test_sync_then_grow(self):
+        self._fold('sync', 'grow')
+        self.assertAlmostEqual(self.line.unit_price, self.line.initial_unit_price)
+
+    def test_grow_keeps_raised_plan(self):
+        self._fold('grow', 'grow')
+        self.assertAlmostEqual(self.line.qty_plan, 5000.0)
+        self.assertAlmostEqual(self.line.unit_price, 15.0)
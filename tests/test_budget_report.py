@@ -0,0 +1,29 @@
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetReport(BudgetTestCommon):
+
+    def _report_keys(self):
+        Report = self.env['budget.report']
+        Report.action_refresh()
+        return {row.id: (row.item_id.id, row.product_id.id) for row in Report.search([])}
+
+    def test_report_ids_stable_across_refresh(self):
+        before = self._report_keys()
+
+        # baris baru untuk item paling awal akan menggeser id hasil row_number()
+        first_leaf = self.budgets.item_ids.filtered('parent_id').sorted('id')[0]
+        product = self.env['product.product'].create({'name': 'Report Product', 'standard_price': 5.0})
+        self.env['budget.item.line'].create({
+            'item_id': first_leaf.id,
+            'product_id': product.id,
+            'qty_plan': 1.0,
+        })
+        after = self._report_keys()
+
+        for report_id, key in before.items():
+            self.assertEqual(after[report_id], key)
+        self.assertEqual(len(after), len(before) + 1)
@@ -0,0 +1,56 @@
+from collections import Counter
+
+from odoo.tests import tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetRollup(BudgetTestCommon):
+
+    def _record_amount_computes(self):
+        computed = Counter()
+        Item = self.env.registry['budget.item']
+        compute_amounts = Item._compute_amounts
+
+        def _compute_amounts(records):
+            computed.update(records.ids)
+            return compute_amounts(records)
+
+        self.patch(Item, '_compute_amounts', _compute_amounts)
+        return computed
+
+    def test_leaf_update_touches_only_ancestors(self):
+        budget = self.budgets[0]
+        leaf = budget.item_ids.filtered('parent_id')[0]
+        line = leaf.line_ids[0]
+        ancestor_ids = {int(item_id) for item_id in leaf.parent_path.split('/')[:-1]}
+        before = {item.id: item.budget_plan for item in budget.item_ids | self.budgets[1:].item_ids}
+
+        computed = self._record_amount_computes()
+        line.qty_plan += 10
+        self.env.flush_all()
+
+        # satu tahap rollup: hanya leaf dan parent-nya, masing-masing sekali
+        self.assertEqual(set(computed), ancestor_ids)
+        self.assertTrue(all(count == 1 for count in computed.values()), computed)
+
+        delta = 10 * line.unit_price
+        for item_id in ancestor_ids:
+            item = self.env['budget.item'].browse(item_id)
+            self.assertAlmostEqual(item.budget_plan, before[item_id] + delta)
+            self.assertAlmostEqual(item.remaining, item.budget_plan - item.request)
+        for item_id, budget_plan in before.items():
+            if item_id not in ancestor_ids:
+                self.assertAlmostEqual(self.env['budget.item'].browse(item_id).budget_plan, budget_plan)
+
+    def test_sibling_update_keeps_parent_total(self):
+        leaves = self.budgets[0].item_ids.filtered('parent_id')
+        parent = leaves[0].parent_id
+        siblings = leaves.filtered(lambda item: item.parent_id == parent)
+
+        siblings.line_ids.qty_plan = 7
+        self.env.flush_all()
+
+        self.assertAlmostEqual(parent.budget_plan, sum(siblings.mapped('budget_plan')))
+        self.assertAlmostEqual(parent.budget_plan, sum(siblings.line_ids.mapped('subtotal')))
@@ -0,0 +1,38 @@
+from odoo import fields
+from odoo.tests import Form, tagged
+
+from .common import BudgetTestCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetTemplate(BudgetTestCommon):
+
+    def _expected_item_count(self):
+        return self.scale['parents'] * (self.scale['children'] + 1)
+
+    def test_form_create_from_template(self):
+        # preview onchange tidak boleh ikut tersimpan di samping item dari template
+        today = fields.Date.today()
+        with Form(self.env['budget.budget']) as budget_form:
+            budget_form.date = today
+            budget_form.budget_type = 'project'
+            budget_form.start_periode = today.replace(month=1, day=1)
+            budget_form.end_periode = today.replace(month=12, day=31)
+            budget_form.template_id = self.templates[0]
+            self.assertEqual(len(budget_form.top_item_ids), self.scale['parents'])
+        budget = budget_form.record
+
+        self.assertEqual(len(budget.item_ids), self._expected_item_count())
+        self.assertEqual(len(budget.top_item_ids), self.scale['parents'])
+        self.assertEqual(
+            len(budget.item_ids.filtered('parent_id')), self.scale['parents'] * self.scale['children'],
+        )
+
+    def test_form_change_template_replace(self):
+        budget = self.env['budget.budget'].create(self._budget_vals(self.templates[0]))
+        template = self._create_templates(1)
+        with Form(budget) as budget_form:
+            budget_form.template_id = template
+
+        self.assertEqual(len(budget.item_ids), self._expected_item_count())
+        self.assertEqual(budget.item_ids.template_detail_id.template_id, template)